@@ -1,74 +1,102 @@
+import os
+import sys
 import pandas as pd
-import smtplib, ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-import my_gmail_account as gmail  # Gmailアカウント情報を格納したファイルをインポート
+from attachments import attachment_part
+from cover_letter import load_letter, load_profile
+from email_extract import best_recipient
+from smtp_dispatch import GMAIL_PER_DAY, GMAIL_PER_MINUTE, SendJob, SMTPDispatcher
+from lead_store import LeadStore
+from perf_metrics import get_metrics, instrument
+from send_journal import SendJournal, journal_path_for
+from suppression import SuppressionList
 
-def send_email(to_email, cafe_name, subject, resume_path):
-    # Gmail SMTPサーバー情報
-    smtp_server = "smtp.gmail.com"
-    port = 465
+# 送信済みアドレスの抑止リストを初めて作るときに取り込むワークブック
+KNOWN_WORKBOOKS = ["Resume/places_data.xlsx", "Resume/places_data_real.xlsx"]
 
-    # メールメッセージの作成
+def load_account():
+    # Gmailアカウント情報（my_gmail_account）は送信する時だけ読み込む（accountを渡せば不要）
+    import my_gmail_account as gmail
+    return gmail.account, gmail.password
+
+@instrument("build_message")
+def build_message(to_email, body, profile, from_email):
+    # メールメッセージの作成（本文はテンプレートからレンダリング済み）
     msg = MIMEMultipart()
-    msg["From"] = gmail.account
+    msg["From"] = from_email
     msg["To"] = to_email
-    msg["Subject"] = subject
-
-    # HTML形式の本文をフォーマットして添付
-    html_body = f"""
-    <html>
-    <body>
-        <p>Dear Hiring Manager,</p>
-    
-        <p>I am excited to apply for the Barista position at {cafe_name}. Currently working as a barista at Brunetti Oro in Melbourne, I bring two years of barista experience from Japan, along with strong customer service and coffee-making skills. My roles have prepared me to excel in fast-paced, customer-focused environments.</p>
-    
-        <p>Passionate about coffee culture, I am dedicated to creating excellent customer experiences and maintaining a welcoming atmosphere. I am available to work flexible hours, including weekends and holidays.</p>
-    
-        <p>Please find my resume attached. I look forward to the opportunity to contribute my skills and enthusiasm to {cafe_name}.</p>
-    
-        <p>Thank you for your time and consideration.</p>
-    
-        <p>Warm regards,<br>
-        Taiki Ogura<br>
-        Phone: 123 456 789<br>
-        Email: <a href="mailto:1234567@gmail.com">1234567@gmail.com</a></p>
-    </body>
-    </html>
-    """
-    msg.attach(MIMEText(html_body, "html"))
-
-    # PDFファイルを添付
-    try:
-        with open(resume_path, "rb") as attachment:
-            part = MIMEBase("application", "pdf")
-            part.set_payload(attachment.read())
-        
-        # 添付ファイルをエンコード
-        encoders.encode_base64(part)
-        
-        part.add_header(
-            "Content-Disposition",
-            f"attachment; filename={resume_path.split('/')[-1]}",
-        )
+    msg["Subject"] = profile.subject
+    msg.attach(MIMEText(body, "html"))
 
-        # メッセージに添付ファイルを追加
-        msg.attach(part)
+    # PDFファイルを添付（エンコード済みのパートは実行中キャッシュされ、全メッセージで共有）
+    try:
+        msg.attach(attachment_part(profile.resume_path))
     except Exception as e:
         print(f"Failed to attach resume: {e}")
 
-    # GmailのSMTPサーバーにSSLを使って接続し、メールを送信
-    try:
-        with smtplib.SMTP_SSL(smtp_server, port, context=ssl.create_default_context()) as server:
-            server.login(gmail.account, gmail.password)
-            server.send_message(msg)
-            print(f"Email sent to {to_email} for {cafe_name}")
-    except Exception as e:
-        print(f"Failed to send email to {to_email}: {e}")
+    return msg
+
+def load_suppression(filenames=()):
+    # 全ワークブック・全プロフィール共通の抑止リスト（初回のみ既存ワークブックから取り込み）
+    suppression = SuppressionList()
+    if not suppression.exists:
+        imported = suppression.import_workbooks(KNOWN_WORKBOOKS + [name for name in filenames if name not in KNOWN_WORKBOOKS])
+        print(f"Imported {imported} sent addresses into the suppression list")
+    return suppression
+
+def queue_job(jobs, key, business_name, email, email_candidates, suppression):
+    # 送信先を決めて送信キューに追加（使えるアドレスがない・送信済みの場合はスキップ）
+    to_email = best_recipient(email, email_candidates)
+    if to_email is None:
+        print(f"Skipped {business_name}: no usable email address")
+        return None
+    reason = suppression.claim(to_email)
+    if reason:
+        print(f"Skipped {business_name}: {to_email} {reason}")
+        return None
+    job = SendJob(key, to_email, business_name)
+    jobs.append(job)
+    return job
+
+def dispatch_jobs(jobs, profile, letter, suppression, connections=3, per_minute=GMAIL_PER_MINUTE, per_day=GMAIL_PER_DAY, on_sent=None,
+                  smtp_options=None, account=None):
+    # Gmailの送信上限（1分あたり・1日あたり）を守りながら複数接続で送信
+    # smtp_optionsでhost/port/use_sslを上書きできる（ベンチマークのローカルSMTPシンク用）
+    # 1日の上限は直近24時間に送信した件数を差し引いて適用（実行ごとではない）
+    # accountは(アドレス, パスワード)、省略時はmy_gmail_accountから読み込む
+    from_email, password = account or load_account()
+    sent_last_day = suppression.sent_last_day()
+    if per_day:
+        print(f"{sent_last_day} sent in the last 24 hours, {max(0, per_day - sent_last_day)} left today")
+    dispatcher = SMTPDispatcher(from_email, password, connections=connections,
+                                per_minute=per_minute, per_day=per_day, sent_last_day=sent_last_day,
+                                **(smtp_options or {}))
 
-def send_applications_from_excel(filename, subject, resume_path):
+    def sent(job):
+        print(f"Email sent to {job.to_email} for {job.name}")
+        suppression.add(job.to_email, source=profile.subject)
+        if on_sent:
+            on_sent(job)
+
+    # 本文は送信前にまとめてレンダリング
+    bodies = dict(zip([job.key for job in jobs], letter.render_many([job.name for job in jobs])))
+    result = dispatcher.dispatch(jobs, lambda job: build_message(job.to_email, bodies[job.key], profile, from_email), sent)
+    for kind, failures in (("Temporary", result.transient), ("Permanent", result.permanent)):
+        for job in jobs:
+            if job.key in failures:
+                print(f"{kind} failure sending to {job.to_email}: {failures[job.key]}")
+    print(result)
+    print(suppression.report())
+    return result
+
+def send_applications_from_excel(profile, filename=None, connections=3, per_minute=GMAIL_PER_MINUTE, per_day=GMAIL_PER_DAY,
+                                 suppression=None, smtp_options=None, account=None):
+    # テンプレートのプレースホルダーは送信開始前に検証（エラーならここで止まる）
+    letter = load_letter(profile)
+    filename = filename or profile.leads
+    if suppression is None:
+        suppression = load_suppression([filename])
     try:
         # Excelファイルを読み込み、実行フラグがFalseの行を取得
         df = pd.read_excel(filename)
@@ -81,24 +109,63 @@ def send_applications_from_excel(filename, subject, resume_path):
         
         #df_to_send = df[(df["execution_flag"] == False) & df["email"].notnull()]
 
-        # メールを送信し、送信後にフラグを更新
+        # 送信ジャーナルを再生し、前回までに送信済みの行はスキップ
+        journal = SendJournal(journal_path_for(filename))
+        addresses = {}
+
+        # 送信先を決めて送信キューを作成
+        jobs = []
         for index, row in df_to_send.iterrows():
-            cafe_name = row["name"]  # `Name`列のホテル名を取得
-            to_email = row["email"]
-            send_email(to_email, cafe_name, subject, resume_path)
-            #df.at[index, "execution_flag"] = True  # フラグをTrueに更新
-            df.iloc[index, execution_flag_column] = True  # フラグをTrueに更新
-
-        # 実行フラグが更新されたExcelファイルを上書き保存
-        df.to_excel(filename, index=False)
+            business_name = row["name"]  # `Name`列の店名を取得
+            if journal.is_sent(business_name, row.get("address")):
+                continue
+            # 送信先として使えない・他のファイルやプロフィールで送信済みのアドレスはスキップ
+            if queue_job(jobs, index, business_name, row["email"], row.get("email_candidates"), suppression):
+                addresses[index] = row.get("address")
+        print(f"{len(journal)} already sent according to {journal.path}")
+
+        # 複数のSMTP接続で並列に送信し、1通送るごとにジャーナルへ記録（fsync）
+        with journal:
+            dispatch_jobs(jobs, profile, letter, suppression, connections, per_minute, per_day,
+                          on_sent=lambda job: journal.record(job.name, addresses[job.key], job.to_email),
+                          smtp_options=smtp_options, account=account)
+
+        # ジャーナルの内容を実行フラグ列にまとめて反映
+        for index, row in df.iterrows():
+            if journal.is_sent(row["name"], row.get("address")):
+                df.iloc[index, execution_flag_column] = True  # フラグをTrueに更新
+
+        # 実行フラグが更新されたExcelファイルを一時ファイル経由で置き換え（途中で落ちても元のファイルは壊れない）
+        temp_filename = filename + ".tmp.xlsx"
+        df.to_excel(temp_filename, index=False)
+        os.replace(temp_filename, filename)
         print("All emails sent successfully and execution flags updated.")
 
     except Exception as e:
         print(f"Failed to read or process the Excel file: {e}")
 
-# 使用例
-filename = "Resume/places_data.xlsx"
-subject = "Application for Barista Position"
-resume_path = "Resume/resume_cafe.pdf"  # レジュメのファイルパスを変更
+def send_applications_from_store(db_path, profile, connections=3, per_minute=GMAIL_PER_MINUTE, per_day=GMAIL_PER_DAY,
+                                 suppression=None, smtp_options=None, account=None):
+    # SQLiteのリードストアから未送信の行を取得し、1件送るごとにフラグを更新
+    letter = load_letter(profile)
+    if suppression is None:
+        suppression = load_suppression()
+    store = LeadStore(db_path)
+    try:
+        jobs = []
+        for lead in store.unsent():
+            queue_job(jobs, lead["id"], lead["name"], lead["email"], lead["email_candidates"], suppression)
+        dispatch_jobs(jobs, profile, letter, suppression, connections, per_minute, per_day,
+                      on_sent=lambda job: store.mark_sent([job.key]), smtp_options=smtp_options,
+                      account=account)
+        print("All emails sent successfully and execution flags updated.")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    # 使用例: python EmailSending.py [profiles/<profile>.json]
+    profile_path = sys.argv[1] if len(sys.argv) > 1 else "profiles/cafe_barista.json"
+    send_applications_from_excel(load_profile(profile_path))
+    get_metrics().print_summary()
+    get_metrics().write_reports("resume/send_metrics")
 
-send_applications_from_excel(filename, subject, resume_path)
@@ -9,9 +9,15 @@ Created on Fri Nov 15 13:14:25 2024
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
-import re
 import os
+from email_extract import extract_email
+from places_api import get_details_client
+from perf_metrics import get_metrics, instrument
 
+# Website と営業時間を1回の Details 呼び出しでまとめて取得
+DETAILS_FIELDS = ("website", "opening_hours")
+
+@instrument("search_places_with_text")
 def search_places_with_text(query, api_key):
     url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     params = {
@@ -48,47 +54,22 @@ def search_places_with_text(query, api_key):
     return places_data
 
 
+@instrument("get_place_website")
 def get_place_website(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {
-        "place_id": place_id,
-        "fields": "website",
-        "key": api_key
-    }
-    
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return data.get("result", {}).get("website", "No website available")
-    return "No website available"
+    details = get_details_client(api_key, DETAILS_FIELDS).get(place_id)
+    return details.website or "No website available"
 
 
+@instrument("get_opening_hours")
 def get_opening_hours(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {
-        "place_id": place_id,
-        "fields": "opening_hours",
-        "key": api_key
-    }
-    
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        opening_hours = data.get("result", {}).get("opening_hours", {}).get("weekday_text", [])
-        return ", ".join(opening_hours) if opening_hours else "No hours available"
-    return "No hours available"
+    opening_hours = get_details_client(api_key, DETAILS_FIELDS).get(place_id).weekday_text
+    return ", ".join(opening_hours) if opening_hours else "No hours available"
 
 
 def get_email_from_website(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        html_content = response.text
-        emails = set(re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?", html_content))
-        
-        if emails:
-            return list(emails)[0]
+        with get_metrics().timer("get_email_from_website"):
+            return extract_email(url)
     except requests.RequestException as e:
         print(f"Failed to access {url}: {e}")
     return None
@@ -96,6 +77,7 @@ def get_email_from_website(url):
 
 combined.to_excel(filename, index=False)
 
+@instrument("save_to_excel")
 def save_to_excel(data, filename="Resume/places_data_real.xlsx"):
     # 必須列
     columns = ["name", "address", "website", "email", "opening_hours", "execution_flag"]
@@ -150,3 +132,7 @@ query = "Restaurant near CBD"
 
 places_data = search_places_with_text(query, api_key)
 save_to_excel(places_data)
+
+# ステージごとの処理時間・呼び出し回数・エラー率を出力
+get_metrics().print_summary()
+get_metrics().write_reports("resume/run_metrics")
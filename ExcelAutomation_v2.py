@@ -9,20 +9,25 @@ Created on Mon Dec  2 17:11:27 2024
 import pandas as pd
 import os
 import requests
-import re
-import time
 from bs4 import BeautifulSoup
+from email_extract import extract_email
+from places_api import fetch_text_search_page, get_details_client
+from perf_metrics import get_metrics, instrument
 
+# Website と営業時間を1回の Details 呼び出しでまとめて取得
+DETAILS_FIELDS = ("website", "opening_hours")
+
+@instrument("search_places_with_text")
 def search_places_with_text(query, api_key, max_results=200, existing_names=None):
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     params = {"query": query, "key": api_key}
+    token_issued_at = None
     places_data = []
 
     if existing_names is None:
         existing_names = set()
 
     while len(places_data) < max_results:
-        response = requests.get(url, params=params)
+        response = fetch_text_search_page(params, token_issued_at=token_issued_at)
         if response.status_code != 200:
             print(f"Error: {response.status_code}")
             break
@@ -55,60 +60,50 @@ def search_places_with_text(query, api_key, max_results=200, existing_names=None
         next_page_token = data.get("next_page_token")
         if not next_page_token:
             break
-        params["pagetoken"] = next_page_token
-        time.sleep(2)  # 推奨の待機時間
+        params["pagetoken"] = next_page_token  # トークンが有効になるまで fetch_text_search_page が短い間隔で再試行
+        token_issued_at = response.received_at
 
     return places_data[:max_results]
 
+@instrument("get_place_website")
 def get_place_website(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "website", "key": api_key}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json().get("result", {}).get("website", "No website available")
-    return "No website available"
+    details = get_details_client(api_key, DETAILS_FIELDS).get(place_id)
+    return details.website or "No website available"
 
+@instrument("get_opening_hours")
 def get_opening_hours(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "opening_hours", "key": api_key}
-    response = requests.get(url, params=params)
-    
-    if response.status_code == 200:
-        hours = response.json().get("result", {}).get("opening_hours", {}).get("weekday_text", [])
-        if hours:
-            hours_dict = {}
-            closed_days = []
-
-            for day_hours in hours:
-                day, time = day_hours.split(": ", 1)
-                if time.strip().lower() == "closed":
-                    closed_days.append(day)
-                else:
-                    hours_dict.setdefault(time.strip(), []).append(day[:3])
-
-            opening_hours = []
-            for time, days in hours_dict.items():
-                day_range = ", ".join(days) if len(days) == 1 else f"{days[0]}-{days[-1]}"
-                opening_hours.append(f"{day_range}: {time}")
-
-            formatted_hours = ", ".join(opening_hours)
-            formatted_closed = ", ".join(closed_days) if closed_days else "None"
-            return formatted_hours, formatted_closed
+    hours = get_details_client(api_key, DETAILS_FIELDS).get(place_id).weekday_text
+    if hours:
+        hours_dict = {}
+        closed_days = []
+
+        for day_hours in hours:
+            day, time = day_hours.split(": ", 1)
+            if time.strip().lower() == "closed":
+                closed_days.append(day)
+            else:
+                hours_dict.setdefault(time.strip(), []).append(day[:3])
+
+        opening_hours = []
+        for time, days in hours_dict.items():
+            day_range = ", ".join(days) if len(days) == 1 else f"{days[0]}-{days[-1]}"
+            opening_hours.append(f"{day_range}: {time}")
+
+        formatted_hours = ", ".join(opening_hours)
+        formatted_closed = ", ".join(closed_days) if closed_days else "None"
+        return formatted_hours, formatted_closed
 
     return "No hours available", "No closed days"
 
 def get_email_from_website(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        html_content = response.text
-        emails = set(re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?", html_content))
-        if emails:
-            return list(emails)[0]
+        with get_metrics().timer("get_email_from_website"):
+            return extract_email(url)
     except requests.RequestException as e:
         print(f"Failed to access {url}: {e}")
     return None
 
+@instrument("save_to_excel")
 def save_to_excel(data, filename="resume/places_data.xlsx"):
     columns = ["name", "address", "website", "email", "opening_hours", "closed_days", "execution_flag"]
     
@@ -127,6 +122,7 @@ def save_to_excel(data, filename="resume/places_data.xlsx"):
     df_combined = pd.concat([df_existing, df_new], ignore_index=True)
     df_combined.to_excel(filename, index=False)
 
+@instrument("load_existing_names")
 def load_existing_names(filename="places_data.xlsx"):
     if os.path.exists(filename):
         try:
@@ -143,3 +139,7 @@ query = "Restaurant near CBD"
 existing_names = load_existing_names()
 places_data = search_places_with_text(query, api_key, existing_names=existing_names)
 save_to_excel(places_data)
+
+# ステージごとの処理時間・呼び出し回数・エラー率を出力
+get_metrics().print_summary()
+get_metrics().write_reports("resume/run_metrics")
@@ -9,24 +9,32 @@ Created on Mon Dec  2 17:12:32 2024
 import pandas as pd
 import os
 import requests
-import re
-import time
 from bs4 import BeautifulSoup
+from email_extract import extract_email
+from places_api import fetch_text_search_page, get_details_client
+from xlsx_append import append_rows
+from dedup_index import RECEPTION_INDEX_PATH, DedupIndex
+from perf_metrics import get_metrics, instrument
+from http_cassette import cassette_from_env
+
+# Website と営業時間を1回の Details 呼び出しでまとめて取得
+DETAILS_FIELDS = ("website", "opening_hours")
 
 def normalize_name(name):
     """名前を小文字にして前後のスペースを削除"""
     return name.strip().lower() if name else ""
 
-def search_places_with_text(query, api_key, max_results=300, existing_names=None):
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+@instrument("search_places_with_text")
+def search_places_with_text(query, api_key, max_results=300, existing_names=None, dedup_index=None):
     params = {"query": query, "key": api_key}
+    token_issued_at = None
     places_data = []
 
     if existing_names is None:
         existing_names = set()
 
     while len(places_data) < max_results:
-        response = requests.get(url, params=params)
+        response = fetch_text_search_page(params, token_issued_at=token_issued_at)
         if response.status_code != 200:
             print(f"Error: {response.status_code}")
             break
@@ -34,10 +42,11 @@ def search_places_with_text(query, api_key, max_results=300, existing_names=None
         data = response.json()
         places = data.get("results", [])
 
-        # 名前を正規化して重複排除
+        # 名前を正規化して重複排除（インデックスに登録済みの場所は Details を呼ぶ前に除外）
         filtered_places = [
             place for place in places 
             if normalize_name(place.get("name")) not in existing_names
+            and not (dedup_index is not None and dedup_index.is_known(place))
         ]
         for place in filtered_places:
             name = normalize_name(place.get("name"))  # 名前を正規化
@@ -50,6 +59,7 @@ def search_places_with_text(query, api_key, max_results=300, existing_names=None
 
             places_data.append({
                 "name": place.get("name"),  # 元の形式の名前を保存
+                "place_id": place_id,
                 "address": address,
                 "website": website,
                 "email": email,
@@ -62,64 +72,61 @@ def search_places_with_text(query, api_key, max_results=300, existing_names=None
         next_page_token = data.get("next_page_token")
         if not next_page_token:
             break
-        params["pagetoken"] = next_page_token
-        time.sleep(2)  # 推奨の待機時間
+        params["pagetoken"] = next_page_token  # トークンが有効になるまで fetch_text_search_page が短い間隔で再試行
+        token_issued_at = response.received_at
 
     return places_data[:max_results]
 
+@instrument("get_place_website")
 def get_place_website(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "website", "key": api_key}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json().get("result", {}).get("website", "No website available")
-    return "No website available"
+    details = get_details_client(api_key, DETAILS_FIELDS).get(place_id)
+    return details.website or "No website available"
 
+@instrument("get_opening_hours")
 def get_opening_hours(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "opening_hours", "key": api_key}
-    response = requests.get(url, params=params)
-    
-    if response.status_code == 200:
-        hours = response.json().get("result", {}).get("opening_hours", {}).get("weekday_text", [])
-        if hours:
-            hours_dict = {}
-            closed_days = []
-
-            for day_hours in hours:
-                day, time = day_hours.split(": ", 1)
-                if time.strip().lower() == "closed":
-                    closed_days.append(day)
-                else:
-                    hours_dict.setdefault(time.strip(), []).append(day[:3])
-
-            opening_hours = []
-            for time, days in hours_dict.items():
-                day_range = ", ".join(days) if len(days) == 1 else f"{days[0]}-{days[-1]}"
-                opening_hours.append(f"{day_range}: {time}")
-
-            formatted_hours = ", ".join(opening_hours)
-            formatted_closed = ", ".join(closed_days) if closed_days else "None"
-            return formatted_hours, formatted_closed
+    hours = get_details_client(api_key, DETAILS_FIELDS).get(place_id).weekday_text
+    if hours:
+        hours_dict = {}
+        closed_days = []
+
+        for day_hours in hours:
+            day, time = day_hours.split(": ", 1)
+            if time.strip().lower() == "closed":
+                closed_days.append(day)
+            else:
+                hours_dict.setdefault(time.strip(), []).append(day[:3])
+
+        opening_hours = []
+        for time, days in hours_dict.items():
+            day_range = ", ".join(days) if len(days) == 1 else f"{days[0]}-{days[-1]}"
+            opening_hours.append(f"{day_range}: {time}")
+
+        formatted_hours = ", ".join(opening_hours)
+        formatted_closed = ", ".join(closed_days) if closed_days else "None"
+        return formatted_hours, formatted_closed
 
     return "No hours available", "No closed days"
 
 def get_email_from_website(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        html_content = response.text
-        emails = set(re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?", html_content))
-        if emails:
-            return list(emails)[0]
+        with get_metrics().timer("get_email_from_website"):
+            return extract_email(url)
     except requests.RequestException as e:
         print(f"Failed to access {url}: {e}")
     return None
 
 
-def save_to_excel(data, filename="resume/places_data_reception.xlsx"):
+@instrument("save_to_excel")
+def save_to_excel(data, filename="resume/places_data_reception.xlsx", mode="rewrite"):
     columns = ["name", "address", "website", "email", "opening_hours", "closed_days", "execution_flag"]
-    
+
+    # 追記モード: 新しい行だけを既存シートの末尾に書き込む
+    if mode == "append":
+        filtered_data = [{column: entry.get(column) for column in columns} for entry in data if entry.get("email")]
+        result = append_rows(filename, {None: filtered_data})
+        print(result)
+        return result
+
     if os.path.exists(filename):
         try:
             df_existing = pd.read_excel(filename)
@@ -136,7 +143,7 @@ def save_to_excel(data, filename="resume/places_data_reception.xlsx"):
     
 
 
-def save_search_history(data, filename="resume/searched_places.xlsx"):
+def save_search_history(data, filename="resume/searched_places.xlsx", dedup_index=None):
     columns = ["name"]
     if os.path.exists(filename):
         try:
@@ -153,23 +160,35 @@ def save_search_history(data, filename="resume/searched_places.xlsx"):
     df_combined.drop_duplicates(subset="name", inplace=True)  # 重複排除
     df_combined.to_excel(filename, index=False)
 
-def load_existing_names(filenames=["places_data_reception.xlsx", "searched_places.xlsx"]):
-    all_names = set()
-    for filename in filenames:
-        if os.path.exists(filename):
-            try:
-                df = pd.read_excel(filename)
-                # 名前を正規化してセットに追加
-                all_names.update(normalize_name(name) for name in df["name"].dropna())
-            except Exception as e:
-                print(f"Error reading Excel: {e}")
-    return all_names
+    # 検索済みの場所を重複排除インデックスに追記
+    if dedup_index is not None:
+        dedup_index.add_many(data)
+
+def load_dedup_index(filenames=["places_data_reception.xlsx", "searched_places.xlsx"], index_path=RECEPTION_INDEX_PATH):
+    # インデックスファイルがまだ無い場合だけExcelから作成
+    dedup_index = DedupIndex(index_path)
+    if not dedup_index.exists:
+        dedup_index.seed_from_workbooks(filenames)
+    return dedup_index
+
+@instrument("load_existing_names")
+def load_existing_names(filenames=["places_data_reception.xlsx", "searched_places.xlsx"], index_path=RECEPTION_INDEX_PATH):
+    return set(load_dedup_index(filenames, index_path).names)
 
 # 使用例
 api_key = "GOOGLE MAPS API KEYS"
 query = "Hotel near Murrumbeena"
 
-existing_names = load_existing_names()
-places_data = search_places_with_text(query, api_key, existing_names=existing_names)
+dedup_index = load_dedup_index()
+existing_names = set(dedup_index.names)
+# LEADGEN_CASSETTE=<path> [LEADGEN_CASSETTE_MODE=record|replay|auto] でHTTP通信を記録・再生
+with cassette_from_env() as cassette:
+    places_data = search_places_with_text(query, api_key, existing_names=existing_names, dedup_index=dedup_index)
+if cassette is not None:
+    print(f"HTTP cassette: {cassette.stats()}")
 save_to_excel(places_data)
-save_search_history([{"name": place["name"]} for place in places_data])
+save_search_history(places_data, dedup_index=dedup_index)
+
+# ステージごとの処理時間・呼び出し回数・エラー率を出力
+get_metrics().print_summary()
+get_metrics().write_reports("resume/run_metrics")
@@ -9,8 +9,11 @@ Created on Sat Dec  7 15:42:56 2024
 import pandas as pd
 import os
 import requests
-import re
-import time
+from email_extract import extract_email
+from places_api import fetch_text_search_page, get_details_client
+from xlsx_append import append_rows
+from dedup_index import DEFAULT_INDEX_PATH, DedupIndex
+from perf_metrics import get_metrics, instrument
 
 
 def normalize_name(name):
@@ -18,16 +21,17 @@ def normalize_name(name):
     return name.strip().lower() if name else ""
 
 
-def search_places_with_text(query, api_key, max_results=300, existing_names=None):
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+@instrument("search_places_with_text")
+def search_places_with_text(query, api_key, max_results=300, existing_names=None, dedup_index=None):
     params = {"query": query, "key": api_key}
+    token_issued_at = None
     places_data = []
 
     if existing_names is None:
         existing_names = set()
 
     while len(places_data) < max_results:
-        response = requests.get(url, params=params)
+        response = fetch_text_search_page(params, token_issued_at=token_issued_at)
         if response.status_code != 200:
             print(f"Error: {response.status_code}")
             break
@@ -37,7 +41,8 @@ def search_places_with_text(query, api_key, max_results=300, existing_names=None
 
         for place in places:
             name = normalize_name(place.get("name"))
-            if name in existing_names:
+            # 収集済みの場所は Details を呼ぶ前にスキップ
+            if name in existing_names or (dedup_index is not None and dedup_index.is_known(place)):
                 continue
 
             address = place.get("formatted_address")
@@ -47,6 +52,7 @@ def search_places_with_text(query, api_key, max_results=300, existing_names=None
 
             places_data.append({
                 "name": place.get("name"),
+                "place_id": place_id,
                 "address": address,
                 "website": website,
                 "email": email
@@ -57,32 +63,24 @@ def search_places_with_text(query, api_key, max_results=300, existing_names=None
         next_page_token = data.get("next_page_token")
         if not next_page_token:
             break
-        params["pagetoken"] = next_page_token
-        time.sleep(2)
+        params["pagetoken"] = next_page_token  # トークンが有効になるまで fetch_text_search_page が短い間隔で再試行
+        token_issued_at = response.received_at
         
     return places_data[:max_results]
 
 
+@instrument("get_place_website")
 def get_place_website(place_id, api_key):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "website", "key": api_key}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json().get("result", {}).get("website", "No website available")
-    return "No website available"
+    details = get_details_client(api_key, ("website",)).get(place_id)
+    return details.website or "No website available"
 
 
 def get_email_from_website(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        html_content = response.text
-        emails = set(re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?", html_content))
-        if emails:
-            return list(emails)[0]
+        with get_metrics().timer("get_email_from_website"):
+            return extract_email(url)
     except requests.RequestException as e:
         print(f"Failed to access {url}: {e}")
-        
     return None
 
 '''
@@ -108,7 +106,8 @@ def save_to_excel(data, filename="resume/places_data.xlsx"):
             pd.DataFrame(success_data).to_excel(writer, index=False, sheet_name="succeed")
             pd.DataFrame(failure_data).to_excel(writer, index=False, sheet_name="failed")'''
     
-def save_to_excel(data, filename="resume/places_data.xlsx"):
+@instrument("save_to_excel")
+def save_to_excel(data, filename="resume/places_data.xlsx", mode="rewrite", dedup_index=None):
     success_data = [entry for entry in data if entry.get("email")]
     failure_data = [entry for entry in data if not entry.get("email")]
 
@@ -116,7 +115,12 @@ def save_to_excel(data, filename="resume/places_data.xlsx"):
     for entry in success_data:
         entry["execution_flag"] = False  # エクセルでは FALSE と表示される
 
-    if os.path.exists(filename):
+    # 追記モード: 新しい行だけを既存シートの末尾に書き込む
+    result = None
+    if mode == "append":
+        result = append_rows(filename, {"succeed": success_data, "failed": failure_data})
+        print(result)
+    elif os.path.exists(filename):
         with pd.ExcelWriter(filename, mode='a', engine="openpyxl", if_sheet_exists="overlay") as writer:
             # 既存のデータを読み込む
             try:
@@ -126,50 +130,47 @@ def save_to_excel(data, filename="resume/places_data.xlsx"):
                 success_df = pd.DataFrame()
                 failure_df = pd.DataFrame()
 
-            # 既存データの行数を取得
-            #success_start_row = len(success_df) + 1 if not success_df.empty else 0
-            #failure_start_row = len(failure_df) + 1 if not failure_df.empty else 0]
-            success_start_row = 1
-            failure_start_row = 1
-
             # 新しいデータを結合して重複を排除
             success_combined = pd.concat([success_df, pd.DataFrame(success_data)], ignore_index=True).drop_duplicates()
             failure_combined = pd.concat([failure_df, pd.DataFrame(failure_data)], ignore_index=True).drop_duplicates()
 
-            # データをそれぞれのシートに追加
-            success_combined.to_excel(writer, index=False, sheet_name="succeed", startrow=success_start_row)
-            failure_combined.to_excel(writer, index=False, sheet_name="failed", startrow=failure_start_row)
+            # 結合したデータでシートを先頭から上書き（startrow=1 だとヘッダーが二重になる）
+            success_combined.to_excel(writer, index=False, sheet_name="succeed")
+            failure_combined.to_excel(writer, index=False, sheet_name="failed")
     else:
         with pd.ExcelWriter(filename) as writer:
             pd.DataFrame(success_data).to_excel(writer, index=False, sheet_name="succeed")
             pd.DataFrame(failure_data).to_excel(writer, index=False, sheet_name="failed")
 
+    # 保存した行を重複排除インデックスに追記
+    if dedup_index is not None:
+        dedup_index.add_many(data)
+    return result
 
-def load_existing_names(filename="resume/places_data.xlsx"):
-    existing_names = set()
-    if os.path.exists(filename):
-        # 読み込み時にシートが存在するか確認し、初期化
-        try:
-            success_df = pd.read_excel(filename, sheet_name=0)
-            failure_df = pd.read_excel(filename, sheet_name=1)
-        except ValueError as e:
-            print(f"Error reading sheets: {e}")
-            success_df = pd.DataFrame(columns=["name"])
-            failure_df = pd.DataFrame(columns=["name"])
-        
-        # データフレームが空の場合に対応
-        if "name" in success_df.columns:
-            existing_names.update(normalize_name(name) for name in success_df["name"].dropna())
-        if "name" in failure_df.columns:
-            existing_names.update(normalize_name(name) for name in failure_df["name"].dropna())
-    return existing_names
+
+def load_dedup_index(filename="resume/places_data.xlsx", index_path=DEFAULT_INDEX_PATH):
+    # インデックスファイルがまだ無い場合だけExcelから作成
+    dedup_index = DedupIndex(index_path)
+    if not dedup_index.exists:
+        dedup_index.seed_from_workbooks([filename])
+    return dedup_index
+
+
+@instrument("load_existing_names")
+def load_existing_names(filename="resume/places_data.xlsx", index_path=DEFAULT_INDEX_PATH):
+    return set(load_dedup_index(filename, index_path).names)
 
 
 # Example usage
 api_key = "GOOGLE MAPS API KEYS"
 query = "Cafe near Murrumbeena"
 
-existing_names = load_existing_names()
+dedup_index = load_dedup_index()
+existing_names = set(dedup_index.names)
+
+#places_data = search_places_with_text(query, api_key, existing_names=existing_names, dedup_index=dedup_index)
+#save_to_excel(places_data, filename="resume/places_data.xlsx", dedup_index=dedup_index)
 
-#places_data = search_places_with_text(query, api_key, existing_names=existing_names)
-#save_to_excel(places_data, filename="resume/places_data.xlsx")
+# ステージごとの処理時間・呼び出し回数・エラー率を出力
+get_metrics().print_summary()
+get_metrics().write_reports("resume/run_metrics")
@@ -9,9 +9,17 @@ Created on Sat Jan  4 15:12:54 2025
 import pandas as pd
 import os
 import requests
-import re
-import time
-import my_gmail_account as gmail
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contact_crawler import get_crawler
+from email_extract import format_candidates
+from places_api import fetch_text_search_page, get_details_client
+from lead_store import LeadStore
+from xlsx_append import append_rows
+from dedup_index import DEFAULT_INDEX_PATH, DedupIndex
+from rate_limit import get_rate_limiter
+from perf_metrics import get_metrics, instrument
+from http_cassette import cassette_from_env
 
 
 def normalize_name(name):
@@ -19,74 +27,131 @@ def normalize_name(name):
     return name.strip().lower() if name else ""
 
 
-def get_email_from_website(url):
-    """Retrieve the first email address found on a website"""
+@instrument("get_email_from_website", is_error=lambda result: str(result[0]).startswith("Error"))
+def get_email_candidates(url):
+    """Return (best email, ranked candidates) of a website, looking at its contact pages if the homepage has none"""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        emails = re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?", response.text)
-        return emails[0] if emails else None
+        candidates = get_crawler().find_candidates(url)
     except requests.RequestException as e:
-        return f"Error: {e}"
+        return f"Error: {e}", []
+    return (candidates[0].address if candidates else None), candidates
 
 
-def get_place_website(place_id, api_key):
-    """Fetch the website URL for a place using its Place ID"""
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "website", "key": api_key}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json().get("result", {}).get("website", "No website available")
-    return "No website available"
+def get_email_from_website(url):
+    """Retrieve the best-ranked email address of a website"""
+    return get_email_candidates(url)[0]
 
 
-def search_places_with_text(query, api_key, max_results=300, existing_names=None):
-    """Search for places using a text query and collect data"""
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+@instrument("get_place_website")
+def get_place_website(place_id, api_key, budget=None):
+    """Fetch the website URL for a place using its Place ID"""
+    details = get_details_client(api_key, ("website",)).get(place_id, budget=budget)
+    return details.website or "No website available"
+
+
+def collect_place(place, api_key, details_slots, scrape_slots, on_result=None, budget=None):
+    """Resolve the website and email of a single search result"""
+    with details_slots:
+        website = get_place_website(place.get("place_id"), api_key, budget)
+    email, candidates = None, []
+    if website != "No website available":
+        with scrape_slots:
+            email, candidates = get_email_candidates(website)
+    result = {
+        "name": place.get("name"),
+        "place_id": place.get("place_id"),
+        "address": place.get("formatted_address"),
+        "website": website,
+        "email": email or "No email found",
+        "email_candidates": format_candidates(candidates)
+    }
+    if on_result:
+        on_result(result)
+    return result
+
+
+@instrument("search_places_with_text")
+def search_places_with_text(query, api_key, max_results=300, existing_names=None,
+                            parallel=False, details_limit=8, scrape_limit=8, dedup_index=None,
+                            budget=None, on_result=None, names_lock=None):
+    """Search for places using a text query and collect data
+
+    With parallel=True the Details lookups and website scrapes of a page run on a
+    thread pool (at most details_limit / scrape_limit at a time per stage) while
+    the next page is being fetched. Places already in dedup_index are skipped
+    before any Details call is made for them. Text Search and Details calls are
+    charged to budget, and on_result is called with each place as soon as it is collected.
+    Callers running several queries on one existing_names set pass a shared
+    names_lock so a place is only ever claimed by one of them.
+    """
     params = {"query": query, "key": api_key}
-    places_data = []
-    existing_names = existing_names or set()
-
-    while len(places_data) < max_results:
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            print(f"API Error: {response.status_code}")
-            break
-
-        data = response.json()
-        for place in data.get("results", []):
-            name = normalize_name(place.get("name"))
-            if name in existing_names:
-                continue
-
-            website = get_place_website(place.get("place_id"), api_key)
-            email = get_email_from_website(website) if website != "No website available" else None
-            places_data.append({
-                "name": place.get("name"),
-                "address": place.get("formatted_address"),
-                "website": website,
-                "email": email or "No email found"
-            })
-            existing_names.add(name)
-
-        next_page_token = data.get("next_page_token")
-        if not next_page_token:
-            break
-        params["pagetoken"] = next_page_token
-        time.sleep(2)
-        
+    token_issued_at = None
+    existing_names = existing_names if existing_names is not None else set()
+    names_lock = names_lock or threading.Lock()
+    details_slots = threading.BoundedSemaphore(details_limit)
+    scrape_slots = threading.BoundedSemaphore(scrape_limit)
+    executor = ThreadPoolExecutor(max_workers=details_limit + scrape_limit) if parallel else None
+    pending = []
+
+    try:
+        while len(pending) < max_results:
+            response = fetch_text_search_page(params, budget=budget, token_issued_at=token_issued_at)
+            if response is None:
+                print("API budget exhausted")
+                break
+            if response.status_code != 200:
+                print(f"API Error: {response.status_code}")
+                break
+
+            data = response.json()
+            for place in data.get("results", []):
+                if len(pending) >= max_results:
+                    break
+                name = normalize_name(place.get("name"))
+                # Claim the name before the lookup so concurrent pages and queries never collect it twice
+                with names_lock:
+                    if name in existing_names or (dedup_index is not None and dedup_index.is_known(place)):
+                        continue
+                    existing_names.add(name)
+
+                if executor:
+                    pending.append(executor.submit(collect_place, place, api_key, details_slots, scrape_slots, on_result,
+                                                   budget))
+                else:
+                    pending.append(collect_place(place, api_key, details_slots, scrape_slots, on_result, budget))
+
+            next_page_token = data.get("next_page_token")
+            if not next_page_token:
+                break
+            params["pagetoken"] = next_page_token  # fetch_text_search_page polls until the token is usable
+            token_issued_at = response.received_at
+
+        places_data = [item.result() for item in pending] if executor else pending
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+
     return places_data[:max_results]
 
 
-def save_to_excel(data, filename="resume/places_data.xlsx"):
-    """Save the collected place data to an Excel file"""
+@instrument("save_to_excel")
+def save_to_excel(data, filename="resume/places_data.xlsx", mode="rewrite", dedup_index=None):
+    """Save the collected place data to an Excel file
+
+    mode="append" streams only the new deduplicated rows into the existing sheets
+    instead of rebuilding them. The saved rows are added to dedup_index if given.
+    """
     success_data = [entry for entry in data if "@" in entry["email"]]
     failure_data = [entry for entry in data if "@" not in entry["email"]]
     
     for entry in success_data:
         entry["execution_flag"] = False  # 明示的に False を設定
-            
-    if os.path.exists(filename):
+
+    result = None
+    if mode == "append":
+        result = append_rows(filename, {"succeed": success_data, "failed": failure_data})
+        print(result)
+    elif os.path.exists(filename):
         with pd.ExcelWriter(filename, mode='a', engine="openpyxl", if_sheet_exists="overlay") as writer:
             # Read existing sheets or initialize empty DataFrames
             existing_success = pd.read_excel(filename, sheet_name="succeed") if "succeed" in pd.ExcelFile(filename).sheet_names else pd.DataFrame()
@@ -104,27 +169,70 @@ def save_to_excel(data, filename="resume/places_data.xlsx"):
             pd.DataFrame(success_data).to_excel(writer, index=False, sheet_name="succeed")
             pd.DataFrame(failure_data).to_excel(writer, index=False, sheet_name="failed")
 
+    if dedup_index is not None:
+        dedup_index.add_many(data)
+    return result
 
-def load_existing_names(filename="resume/places_data.xlsx"):
-    """Load existing place names from the Excel file to avoid duplication"""
-    existing_names = set()
-    if os.path.exists(filename):
-        try:
-            success_df = pd.read_excel(filename, sheet_name="succeed")
-            failed_df = pd.read_excel(filename, sheet_name="failed")
-            existing_names.update(success_df["name"].apply(normalize_name))
-            existing_names.update(failed_df["name"].apply(normalize_name))
-        except ValueError:
-            pass  # Handle case where sheets don't exist
-    return existing_names
 
+@instrument("save_to_store")
+def save_to_store(data, store, dedup_index=None):
+    """Upsert the collected place data into the SQLite lead store"""
+    for entry in data:
+        if "@" in entry["email"]:
+            entry["execution_flag"] = False
+    inserted = store.upsert_many(data)
+    if dedup_index is not None:
+        dedup_index.add_many(data)
+    print(f"Saved {inserted} new leads ({len(data) - inserted} already known)")
+    return inserted
 
-# Example usage
-query = "Cafe near Dandenong"
 
-existing_names = load_existing_names()
+def recover_failed_leads(store, scrape_limit=8):
+    """Crawl the contact pages of leads saved without an email and update the ones that yield one"""
+    leads = store.without_email()
+    with ThreadPoolExecutor(max_workers=scrape_limit) as executor:
+        results = list(executor.map(lambda lead: get_email_candidates(lead["website"]), leads))
+    recovered = [dict(lead, email=email, email_candidates=format_candidates(candidates))
+                 for lead, (email, candidates) in zip(leads, results) if email and "@" in email]
+    store.upsert_many(recovered)
+    print(f"Recovered {len(recovered)} of {len(leads)} leads without an email")
+    return recovered
+
 
-places_data = search_places_with_text(query, gmail.api_key, existing_names=existing_names)
-save_to_excel(places_data, filename="resume/places_data.xlsx")
+def load_dedup_index(filename="resume/places_data.xlsx", index_path=DEFAULT_INDEX_PATH):
+    """Open the dedup index, seeding it from the Excel file the first time"""
+    dedup_index = DedupIndex(index_path)
+    if not dedup_index.exists:
+        dedup_index.seed_from_workbooks([filename])
+    return dedup_index
 
 
+@instrument("load_existing_names")
+def load_existing_names(filename="resume/places_data.xlsx", index_path=DEFAULT_INDEX_PATH):
+    """Load existing place names from the dedup index to avoid duplication"""
+    return set(load_dedup_index(filename, index_path).names)
+
+
+# Example usage
+if __name__ == "__main__":
+    import my_gmail_account as gmail  # Gmailアカウント情報（APIキー）は直接実行する時だけ読み込む
+
+    query = "Cafe near Dandenong"
+
+    store = LeadStore("resume/leads.sqlite")
+    dedup_index = load_dedup_index()
+    existing_names = set(dedup_index.names)
+
+    # LEADGEN_CASSETTE=<path> [LEADGEN_CASSETTE_MODE=record|replay|auto] でHTTP通信を記録・再生
+    with cassette_from_env() as cassette:
+        places_data = search_places_with_text(query, gmail.api_key, existing_names=existing_names, parallel=True,
+                                              dedup_index=dedup_index)
+    if cassette is not None:
+        print(f"HTTP cassette: {cassette.stats()}")
+    save_to_store(places_data, store, dedup_index)
+    #recover_failed_leads(store)  # failed の行をコンタクトページから再調査
+    #store.export_to_excel("resume/places_data.xlsx")  # succeed/failed のExcelが必要な時だけ書き出す
+    print(f"Place Details cache: {get_details_client(gmail.api_key).cache.stats()}")
+    print(f"next_page_token delays: {get_rate_limiter().page_token_stats()}")
+    get_metrics().print_summary()
+    get_metrics().write_reports("resume/run_metrics")
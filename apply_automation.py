@@ -6,66 +6,77 @@ Created on Mon Nov 25 16:15:10 2024
 @author: gonzaresu
 """
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 
-# ChromeDriverのパス
+from driver_pool import DriverPool
+from indeed_harvester import harvest_many
+from listing_store import ListingStore
+from perf_metrics import get_metrics, instrument
+from waits import get_wait_recorder, new_window_opened, wait_for
+
+# ChromeDriverのパス（Noneの場合はSelenium Managerが自動で用意）
 chromedriver_path = "/Users/gonzaresu/Documents/chromedriver"
-service = Service(chromedriver_path)
 
-# WebDriverの初期化
-driver = webdriver.Chrome(service=service)
 
-try:
-    # Indeedのトップページにアクセス
-    driver.get("https://www.indeed.com/")
-    time.sleep(2)  # ページが完全に読み込まれるまで待機
+@instrument("selenium.apply_to_listing", is_error=lambda applied: not applied)
+def apply_to_listing(driver, url):
+    """Open one listing and start its Indeed Apply flow; returns True if the apply button was clicked"""
+    driver.get(url)
 
-    # 検索ボックスを探してキーワードを入力
-    what_input = driver.find_element(By.ID, "text-input-what")
-    what_input.send_keys("Software Engineer")  # 職種を指定
+    # "Apply Now"ボタンがクリック可能になるまで待機してクリック
+    try:
+        apply_button = wait_for(driver, "apply_button", EC.element_to_be_clickable((By.CLASS_NAME, "ia-IndeedApplyButton")))
+        handles = driver.window_handles
+        # 求人リンク（/rc/clk?jk=…）は読み込み時にリダイレクトされるので、クリック直前のURLと比較する
+        current_url = driver.current_url
+        apply_button.click()
 
-    where_input = driver.find_element(By.ID, "text-input-where")
-    where_input.clear()  # デフォルトの場所をクリア
-    where_input.send_keys("Remote")  # リモートジョブを検索
-    where_input.send_keys(Keys.RETURN)
-    time.sleep(3)
+        # アプライフォームが新しいウィンドウで開くか、ページが遷移するまで待機
+        opened = wait_for(driver, "apply_form", EC.any_of(new_window_opened(handles), EC.url_changes(current_url)))
+        if isinstance(opened, str):
+            driver.switch_to.window(opened)
 
-    wait = WebDriverWait(driver, 10)  # 最大10秒待機
-    # ジョブリストを取得
-    job_listings = driver.find_elements(By.CLASS_NAME, "job_seen_beacon")
-    print(f"見つかった求人の数: {len(job_listings)}")
+        # アプライフォームに情報を入力（カスタマイズが必要）
+        print(f"アプライを進行中... {url}")
+        return True
 
-    # 最初のジョブをクリック
-    if job_listings:
-        #job_listings[0].click()
-        wait.until(EC.element_to_be_clickable(job_listings[0])).click()
-        time.sleep(3)
+    except Exception as e:
+        print(f"アプライボタンが見つからないか、エラー: {e}")
+        return False
 
-        # 新しいタブに切り替え
-        driver.switch_to.window(driver.window_handles[-1])
 
-        # "Apply Now"ボタンを探してクリック
-        try:
-            apply_button = driver.find_element(By.CLASS_NAME, "ia-IndeedApplyButton")
-            apply_button.click()
-            time.sleep(2)
+def apply_to_listings(listings, pool, store=None):
+    """Process a queue of harvested listings in parallel across the pool's warm drivers"""
+    results = pool.run(listings, lambda driver, listing: apply_to_listing(driver, listing["url"]))
+    applied = sum(1 for _, result in results if result is True)
+    for listing, result in results:
+        if isinstance(result, Exception):
+            print(f"求人の処理に失敗: {listing['url']}: {result}")
+        if store is not None:
+            # 処理結果を記録し、次回のキューから外す
+            status = "applied" if result is True else "error" if isinstance(result, Exception) else "no_apply_button"
+            store.mark(listing["job_key"], status)
+    print(f"{applied} / {len(listings)} 件のアプライを開始")
+    print(pool.stats)
+    return results
 
-            # アプライフォームに情報を入力（カスタマイズが必要）
-            print("アプライを進行中...")
 
-        except Exception as e:
-            print(f"アプライボタンが見つからないか、エラー: {e}")
-        
-        # タブを閉じて元に戻る
-        driver.close()
-        driver.switch_to.window(driver.window_handles[0])
+if __name__ == "__main__":
+    store = ListingStore()
+    searches = [("Software Engineer", "Remote")]
+    with DriverPool(size=3, max_jobs=20, chromedriver_path=chromedriver_path, block_resources=True) as pool:
+        # 画像・フォント・動画・解析タグは読み込まない（効果は resource_blocking.py で計測）
+        pool.warm()
+        # 検索結果を全ページ収集してリスティングストアへ保存（重複は除外）
+        harvest_many(pool, searches, store, max_pages=5)
+        # Indeed Applyの求人をキューから取り出し、プール全体で並列に処理
+        apply_to_listings(store.pending(apply_type="indeed_apply"), pool, store)
+    print(store.counts())
+    store.close()
 
-finally:
-    # ブラウザを閉じる
-    driver.quit()
\ No newline at end of file
+    # 各ステップの待ち時間の分布を表示・保存
+    get_wait_recorder().print_summary()
+    get_wait_recorder().write_json("resume/apply_wait_timings.json")
+    get_metrics().print_summary()
+    get_metrics().write_reports("resume/apply_metrics")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Encoded MIME attachment parts shared by every message of a send run.
+
+A file is read and base64-encoded once per (path, mtime, size); later calls
+return the same part object, which can be attached to any number of
+messages because serializing a message never modifies its leaf parts.
+"""
+
+import mimetypes
+import os
+import threading
+from email import encoders
+from email.mime.base import MIMEBase
+
+
+_parts = {}
+_lock = threading.Lock()
+
+
+def attachment_part(path):
+    """Encoded attachment part for a file, rebuilt only when the file changes"""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _parts.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        part = MIMEBase(*content_type.split("/", 1))
+        with open(path, "rb") as attachment:
+            part.set_payload(attachment.read())
+        encoders.encode_base64(part)
+        part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
+        _parts[key] = (version, part)
+        return part
+
+
+def clear_attachment_cache():
+    with _lock:
+        _parts.clear()
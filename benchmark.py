@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark of the collect -> save -> send pipeline on local fakes.
+
+The fake Places API, website fleet and SMTP sink from fake_services run in a
+child process, so their CPU and memory are not counted against the pipeline.
+The pipeline itself is the production code: sweep.run_sweep collects leads
+into a LeadStore (Text Search paging, Details and contact crawling), the
+store is exported to the succeed/failed workbook, and
+EmailSending.send_applications_from_store sends a cover letter to every lead
+through the sink. Each stage reports its throughput, the p50/p99 latency of
+the operations it is made of (from perf_metrics) and the peak RSS of the
+process when it finished (ru_maxrss never goes down).
+
+Everything is written to a fresh working directory and the sink is given a
+made-up account, so no real data or credentials are touched and
+my_gmail_account is not needed.
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+from perf_metrics import get_metrics
+
+
+CATEGORIES = ("Cafe", "Restaurant", "Bakery", "Bar")
+
+# perf_metrics stages making up each pipeline stage
+STAGE_OPERATIONS = {
+    "collect": ("places_textsearch_api", "places_details_api", "get_place_website", "website_fetch",
+                "get_email_from_website", "search_places_with_text"),
+    "save": ("export_workbook",),
+    "send": ("build_message", "send_email"),
+}
+
+
+@dataclass
+class StageResult:
+    name: str
+    items: int = 0
+    seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    operations: dict = field(default_factory=dict)
+
+    @property
+    def throughput(self):
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        lines = [f"{self.name}: {self.items} items in {self.seconds:.1f}s ({self.throughput:.1f}/s), "
+                 f"peak RSS {self.peak_rss_mb:.0f}MB"]
+        for name, stage in self.operations.items():
+            lines.append(f"    {name}: {stage['calls']} calls, p50 {stage['p50'] * 1000:.0f}ms, "
+                         f"p99 {stage['p99'] * 1000:.0f}ms, {stage['errors']} errors")
+        return "\n".join(lines)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+@contextlib.contextmanager
+def stage(results, name, quiet=True):
+    """Time a pipeline stage; the block sets result.items"""
+    result = StageResult(name)
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext():
+        yield result
+    result.seconds = time.perf_counter() - started
+    result.peak_rss_mb = peak_rss_mb()
+    stages = get_metrics().report()["stages"]
+    result.operations = {operation: stages[operation] for operation in STAGE_OPERATIONS[name] if operation in stages}
+    results.append(result)
+    print(result, flush=True)
+
+
+def build_locations(leads, results_per_query):
+    queries = math.ceil(leads / results_per_query)
+    return [f"Suburb {i}" for i in range(math.ceil(queries / len(CATEGORIES)))]
+
+
+def start_services(config):
+    """Start fake_services.serve in a child process; returns (process, queue, stop event, addresses)"""
+    from fake_services import serve
+
+    queue = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    process = multiprocessing.Process(target=serve, args=(config, queue, stop), daemon=True)
+    process.start()
+    return process, queue, stop, queue.get(timeout=30)
+
+
+def write_resume(path, size=150 * 1024):
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n" + os.urandom(size))
+
+
+def run_benchmark(leads=1000, latency=0.05, token_delay=1.5, smtp_latency=0.0, site_ports=16,
+                  query_workers=4, details_limit=8, scrape_limit=8, connections=4, api_rate=None,
+                  workdir=None, quiet=True):
+    """Run collect -> save -> send against the fakes and return the report dict"""
+    results_per_query = 60
+    config = {"results_per_query": results_per_query, "latency": latency, "token_delay": token_delay,
+              "site_ports": site_ports, "smtp_latency": smtp_latency}
+    process, queue, stop, addresses = start_services(config)
+    template = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "barista.html")
+    workdir = workdir or tempfile.mkdtemp(prefix="leadgen-bench-")
+    previous_cwd = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    results = []
+    try:
+        import places_api
+        from cover_letter import Profile
+        from EmailSending import send_applications_from_store
+        from lead_store import DEFAULT_DB_PATH, LeadStore
+        from rate_limit import get_rate_limiter
+        from suppression import SuppressionList
+        from sweep import run_sweep
+
+        places_api.TEXT_SEARCH_URL = addresses["places_url"] + "/textsearch/json"
+        places_api.DETAILS_URL = addresses["places_url"] + "/details/json"
+        # The real per-second quotas would dominate every number, so they are lifted unless asked for
+        rate = api_rate or 1_000_000.0
+        get_rate_limiter().set_rates(textsearch=rate, details=rate)
+
+        store = LeadStore(DEFAULT_DB_PATH)
+        with stage(results, "collect", quiet) as result:
+            sweep = run_sweep(CATEGORIES, build_locations(leads, results_per_query), "bench-key", store=store,
+                              query_workers=query_workers, max_results=results_per_query,
+                              details_limit=details_limit, scrape_limit=scrape_limit)
+            result.items = sweep.new_leads
+        with stage(results, "save", quiet) as result:
+            with get_metrics().timer("export_workbook"):
+                store.export_to_excel("resume/places_data.xlsx")
+            result.items = len(store.names())
+        with_email = store.count_unsent()
+        store.close()
+
+        write_resume("resume/resume.pdf")
+        profile = Profile("Bench Applicant", "000 000 000", "bench@example.com", "Application for Barista Position",
+                          template, "resume/resume.pdf")
+        smtp_options = {"host": "127.0.0.1", "port": addresses["smtp_port"], "use_ssl": False}
+        with stage(results, "send", quiet) as result:
+            send_applications_from_store(DEFAULT_DB_PATH, profile, connections=connections, per_minute=None,
+                                         per_day=None, suppression=SuppressionList(), smtp_options=smtp_options,
+                                         account=("bench@example.com", "bench"))
+            store = LeadStore(DEFAULT_DB_PATH)
+            result.items = with_email - store.count_unsent()
+            store.close()
+        page_tokens = get_rate_limiter().page_token_stats()
+    finally:
+        os.chdir(previous_cwd)
+        stop.set()
+        server_counts = queue.get(timeout=30) if process.is_alive() else {}
+        process.join(timeout=10)
+
+    return {
+        "settings": {"leads": leads, "latency": latency, "token_delay": token_delay, "smtp_latency": smtp_latency,
+                     "site_ports": site_ports, "query_workers": query_workers, "details_limit": details_limit,
+                     "scrape_limit": scrape_limit, "connections": connections, "api_rate": api_rate},
+        "workdir": workdir,
+        "stages": [dict(asdict(result), throughput=result.throughput) for result in results],
+        "page_tokens": page_tokens,
+        "servers": server_counts,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=1000, help="number of leads to collect (1k-100k)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean Places API latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=1.5, help="seconds before a next_page_token is usable")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="seconds the sink takes per message")
+    parser.add_argument("--site-ports", type=int, default=16, help="ports (hosts) the website fleet is spread over")
+    parser.add_argument("--query-workers", type=int, default=4)
+    parser.add_argument("--details-limit", type=int, default=8)
+    parser.add_argument("--scrape-limit", type=int, default=8)
+    parser.add_argument("--connections", type=int, default=4, help="SMTP connections")
+    parser.add_argument("--api-rate", type=float, default=None, help="Places requests per second (default: unlimited)")
+    parser.add_argument("--workdir", default=None, help="where the store and workbook go (default: a temp dir)")
+    parser.add_argument("--report", default=None, help="write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.leads, args.latency, args.token_delay, args.smtp_latency, args.site_ports,
+                           args.query_workers, args.details_limit, args.scrape_limit, args.connections,
+                           args.api_rate, args.workdir, quiet=not args.verbose)
+    print(f"Page tokens: {report['page_tokens']}")
+    print(f"Servers: {report['servers']}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
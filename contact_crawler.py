@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bounded same-host crawler that looks for an email address beyond the homepage.
+
+Starting from the homepage it follows contact/about style links, footer links
+and matching sitemap.xml entries, breadth first, within a depth and page
+budget. Email candidates from every visited page are merged and ranked, and
+the crawl stops as soon as one of them is good enough to send to. One keep-alive
+session is shared by all crawls, and a per-host semaphore caps how many
+requests hit the same site at once when crawls run on several threads.
+"""
+
+import re
+import threading
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from email_extract import (CONFIDENT_SCORE, DEFAULT_MAX_BYTES, is_text_response, rank_candidates, read_candidates,
+                           response_encoding)
+from perf_metrics import get_metrics
+
+
+CONTACT_HINTS = ("contact", "about", "enquir", "get-in-touch", "reach", "find-us", "location", "impressum")
+SKIPPED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".pdf", ".zip", ".mp4", ".css", ".js")
+
+LINK_PATTERN = re.compile(r"<a\s[^>]*?href\s*=\s*[\"']([^\"'#]+)[\"'][^>]*>(.*?)</a>", re.IGNORECASE | re.DOTALL)
+FOOTER_PATTERN = re.compile(r"<footer\b", re.IGNORECASE)
+LOC_PATTERN = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+
+
+def host_of(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def contact_score(url, text=""):
+    """Higher for links that look like a contact page; 0 for links not worth following"""
+    target = (urlparse(url).path + " " + text).lower()
+    for rank, hint in enumerate(CONTACT_HINTS):
+        if hint in target:
+            return len(CONTACT_HINTS) - rank + 1
+    return 0
+
+
+def extract_links(html, base_url):
+    """Same-host links worth following as (url, score) pairs: contact/about links, then footer links"""
+    host = host_of(base_url)
+    footer = FOOTER_PATTERN.search(html)
+    footer_start = footer.start() if footer else len(html)
+    scored = {}
+    for match in LINK_PATTERN.finditer(html):
+        url = urljoin(base_url, match.group(1).strip())
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or host_of(url) != host:
+            continue
+        if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            continue
+        text = re.sub(r"<[^>]+>", " ", match.group(2))
+        score = contact_score(url, text)
+        if not score and match.start() >= footer_start:
+            score = 1
+        if score:
+            url = parsed._replace(fragment="").geturl()
+            scored[url] = max(score, scored.get(url, 0))
+    return list(scored.items())
+
+
+class ContactCrawler:
+    """Depth- and page-bounded email search over a site's contact pages"""
+
+    def __init__(self, max_pages=6, max_depth=2, per_host_limit=2, max_bytes=DEFAULT_MAX_BYTES,
+                 timeout=10, use_sitemap=True, session=None):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.per_host_limit = per_host_limit
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.use_sitemap = use_sitemap
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slots(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def fetch(self, url, keep_body=True):
+        """Return (candidates, html) for one page; html is empty when the page is not HTML"""
+        body = bytearray() if keep_body else None
+        with self._slots(host_of(url)), get_metrics().timer("website_fetch"):
+            response = self.session.get(url, timeout=self.timeout, stream=True)
+            with response:
+                response.raise_for_status()
+                if not is_text_response(response):
+                    return [], ""
+                candidates = read_candidates(response, url, self.max_bytes, body)
+                encoding = response_encoding(response)
+        if body:
+            get_metrics().add_bytes("website_fetch", len(body))
+        return candidates, bytes(body or b"").decode(encoding, errors="replace")
+
+    def sitemap_links(self, base_url):
+        """Contact-like URLs listed in the site's sitemap.xml as (url, score) pairs"""
+        sitemap_url = urljoin(base_url, "/sitemap.xml")
+        try:
+            with self._slots(host_of(sitemap_url)):
+                response = self.session.get(sitemap_url, timeout=self.timeout, stream=True)
+                with response:
+                    if response.status_code != 200:
+                        return []
+                    sitemap = response.raw.read(self.max_bytes, decode_content=True).decode("utf-8", errors="replace")
+        except requests.RequestException:
+            return []
+        host = host_of(base_url)
+        return [(url, contact_score(url)) for url in LOC_PATTERN.findall(sitemap)
+                if host_of(url) == host and contact_score(url)]
+
+    def find_candidates(self, url):
+        """Crawl from url until a confident address is found or the budget is spent
+
+        Returns every candidate seen, ranked best first. Raises
+        requests.RequestException if the start page itself cannot be fetched;
+        failures on later pages are skipped.
+        """
+        queue = deque([(url, 0)])
+        seen = {url}
+        found = {}
+        pages = 0
+        while queue and pages < self.max_pages:
+            page_url, depth = queue.popleft()
+            try:
+                candidates, html = self.fetch(page_url)
+            except requests.RequestException:
+                if pages == 0:
+                    raise
+                continue
+            finally:
+                pages += 1
+            for candidate in candidates:
+                # Earlier pages come first when scores tie
+                candidate.position += pages * 1_000_000
+                known = found.get(candidate.address.lower())
+                if known is None or candidate.score > known.score:
+                    found[candidate.address.lower()] = candidate
+            ranked = rank_candidates(found.values())
+            if ranked and ranked[0].score >= CONFIDENT_SCORE:
+                return ranked
+
+            links = extract_links(html, page_url) if depth < self.max_depth else []
+            if pages == 1 and self.use_sitemap:
+                links += self.sitemap_links(page_url)
+            for link, _ in sorted(links, key=lambda item: item[1], reverse=True):
+                if link not in seen:
+                    seen.add(link)
+                    queue.append((link, depth + 1))
+        return rank_candidates(found.values())
+
+    def find_email(self, url):
+        """Best address found by find_candidates, or None"""
+        candidates = self.find_candidates(url)
+        return candidates[0].address if candidates else None
+
+
+_default_crawler = None
+_default_lock = threading.Lock()
+
+
+def get_crawler():
+    """Process-wide crawler so every thread shares the keep-alive pool and host limits"""
+    global _default_crawler
+    with _default_lock:
+        if _default_crawler is None:
+            _default_crawler = ContactCrawler()
+        return _default_crawler
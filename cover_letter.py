@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cover-letter templates and applicant profiles for the EmailSending scripts.
+
+A profile (JSON, see profiles/) holds the applicant details, the subject,
+the resume and the template to use. A template (see templates/) is an HTML
+file with string.Template placeholders such as ${business_name} and
+${applicant_name}. Each template file is parsed once; prepare() fills in the
+profile values once per run, leaving only the per-lead placeholders for
+render_many().
+"""
+
+import html
+import json
+import os
+import string
+import threading
+from dataclasses import dataclass, field
+
+
+# Placeholders filled in per lead; everything else comes from the profile
+LEAD_PLACEHOLDERS = ("business_name",)
+PROFILE_KEYS = ("applicant_name", "phone", "contact_email", "subject", "template", "resume_path")
+
+
+@dataclass
+class Profile:
+    applicant_name: str
+    phone: str
+    contact_email: str
+    subject: str
+    template: str
+    resume_path: str
+    leads: str = None
+    extra: dict = field(default_factory=dict)
+
+    def values(self):
+        """Values available to the template besides the lead placeholders"""
+        values = dict(self.extra)
+        values.update(applicant_name=self.applicant_name, phone=self.phone, contact_email=self.contact_email)
+        return values
+
+
+def load_profile(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    missing = [key for key in PROFILE_KEYS if not data.get(key)]
+    if missing:
+        raise ValueError(f"Profile {path} is missing {', '.join(missing)}")
+    known = {name: data.pop(name) for name in PROFILE_KEYS + ("leads",) if name in data}
+    return Profile(**known, extra=data)
+
+
+class LetterTemplate:
+    """A parsed cover-letter template"""
+
+    def __init__(self, source, name="<template>"):
+        self.name = name
+        self.template = string.Template(source)
+        if not self.template.is_valid():
+            raise ValueError(f"Template {name} has an invalid placeholder")
+        self.placeholders = set(self.template.get_identifiers())
+
+    def validate(self, profile):
+        """Raise ValueError if the template uses a placeholder neither the profile nor the leads provide"""
+        unknown = self.placeholders - set(profile.values()) - set(LEAD_PLACEHOLDERS)
+        if unknown:
+            raise ValueError(f"Template {self.name} uses unknown placeholders: {', '.join(sorted(unknown))}")
+
+    def prepare(self, profile):
+        """Validate against profile and return a template with the profile values already substituted"""
+        self.validate(profile)
+        values = {key: html.escape(str(value)).replace("$", "$$") for key, value in profile.values().items()}
+
+        def convert(match):
+            # Like safe_substitute, but keeps "$$" escaped so the result is still a valid template
+            name = match.group("named") or match.group("braced")
+            return values.get(name, match.group(0)) if name else match.group(0)
+
+        return LetterTemplate(self.template.pattern.sub(convert, self.template.template), self.name)
+
+    def render(self, business_name):
+        return self.template.substitute(business_name=html.escape(str(business_name)))
+
+    def render_many(self, business_names):
+        return [self.render(name) for name in business_names]
+
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def load_template(path):
+    """Parsed template for a file, re-read only when the file changes"""
+    version = os.stat(path).st_mtime_ns
+    with _lock:
+        cached = _templates.get(path)
+        if cached is None or cached[0] != version:
+            with open(path, encoding="utf-8") as f:
+                cached = (version, LetterTemplate(f.read(), path))
+            _templates[path] = cached
+        return cached[1]
+
+
+def load_letter(profile):
+    """Template of a profile, validated and prepared for rendering"""
+    return load_template(profile.template).prepare(profile)
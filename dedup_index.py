@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent dedup index of places we have already collected.
+
+The index is an append-only text file with one "kind<TAB>value" line per key
+(place_id, normalized name or normalized name + address pair). An address
+on its own is never a key: food courts and shopping centres put several
+businesses at the same formatted address. Loading it is a single
+read + split, so startup does not depend on parsing the Excel workbooks, and
+the save path appends only the keys of the rows it has just written.
+"""
+
+import os
+import threading
+
+
+DEFAULT_INDEX_PATH = "resume/dedup_index.tsv"
+# ExcelAutomation_v3 collects hotels/receptions into other workbooks, so it keeps its own index
+RECEPTION_INDEX_PATH = "resume/dedup_index_reception.tsv"
+
+
+def normalize_name(name):
+    """Normalize names by stripping whitespace and converting to lowercase"""
+    return name.strip().lower() if isinstance(name, str) else ""
+
+
+def normalize_address(address):
+    return " ".join(address.lower().replace(",", " ").split()) if isinstance(address, str) else ""
+
+
+def entry_keys(entry):
+    """Index keys of a Text Search result or a saved lead row"""
+    keys = []
+    if entry.get("place_id"):
+        keys.append(("id", str(entry["place_id"])))
+    name = normalize_name(entry.get("name"))
+    if name:
+        keys.append(("name", name))
+    address = normalize_address(entry.get("address") or entry.get("formatted_address"))
+    if name and address:
+        keys.append(("pair", f"{name}|{address}"))
+    return keys
+
+
+class DedupIndex:
+    """Set of known place_ids, normalized names and (name, address) pairs backed by an append-only file"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.ids = set()
+        self.names = set()
+        self.pairs = set()
+        # Lines of other kinds (e.g. "addr" from older index files) are ignored
+        self._sets = {"id": self.ids, "name": self.names, "pair": self.pairs}
+        self._lock = threading.Lock()
+        self.exists = os.path.exists(path)
+        if self.exists:
+            with open(path, encoding="utf-8") as f:
+                for line in f.read().splitlines():
+                    kind, _, value = line.partition("\t")
+                    if kind in self._sets:
+                        self._sets[kind].add(value)
+
+    def __len__(self):
+        return len(self.ids) + len(self.names) + len(self.pairs)
+
+    def is_known(self, entry):
+        """True if the place_id, name or (name, address) pair of the entry was collected before"""
+        return any(value in self._sets[kind] for kind, value in entry_keys(entry))
+
+    def add_many(self, entries):
+        """Add the keys of saved entries, appending only the ones not indexed yet"""
+        with self._lock:
+            new_lines = []
+            for entry in entries:
+                for kind, value in entry_keys(entry):
+                    if value not in self._sets[kind]:
+                        self._sets[kind].add(value)
+                        new_lines.append(f"{kind}\t{value}\n")
+            if new_lines:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(new_lines)
+                self.exists = True
+        return len(new_lines)
+
+    def seed_from_workbooks(self, filenames):
+        """Build the index from existing workbooks; only needed once, before the index file exists"""
+        import pandas as pd
+
+        for filename in filenames:
+            if not os.path.exists(filename):
+                continue
+            try:
+                for df in pd.read_excel(filename, sheet_name=None).values():
+                    df = df.astype(object).where(df.notna(), None)
+                    self.add_many(df.to_dict("records"))
+            except Exception as e:
+                print(f"Error reading Excel: {e}")
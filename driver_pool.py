@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool of warm headless Chrome sessions for the Selenium scripts.
+
+Starting Chrome is the most expensive part of an apply_automation run, so
+the pool keeps up to `size` drivers alive and leases them out to jobs. After
+each job the session is reset (extra tabs closed, cookies and storage
+cleared, about:blank loaded); a driver is replaced after max_jobs jobs or as
+soon as it crashes or fails to reset.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+
+from resource_blocking import DEFAULT_BLOCKED_PATTERNS, DEFAULT_BLOCKED_TYPES, enable_blocking
+
+
+# Errors after which the browser session cannot be trusted any more
+CRASH_ERRORS = (InvalidSessionIdException, NoSuchWindowException, ConnectionError)
+# Site data wiped for every origin a job visited (cookies are cleared browser-wide)
+CLEARED_STORAGE_TYPES = "local_storage,indexeddb,websql,cache_storage,service_workers,file_systems"
+
+
+def origin_of(url):
+    """scheme://host[:port] of an http(s) URL, or None for about:blank, data: and the like"""
+    parsed = urlparse(url or "")
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme in ("http", "https") and parsed.netloc else None
+
+
+def new_chrome(chromedriver_path=None, headless=True, page_load_timeout=30, block_resources=False,
+               blocked_types=DEFAULT_BLOCKED_TYPES, blocked_patterns=DEFAULT_BLOCKED_PATTERNS):
+    """Chrome with the options every script uses; without a path Selenium Manager finds chromedriver
+
+    With block_resources=True images, fonts, media and analytics hosts (see
+    resource_blocking) are dropped before they are requested.
+    """
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,1024")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-dev-shm-usage")
+    service = Service(chromedriver_path) if chromedriver_path else Service()
+    driver = webdriver.Chrome(service=service, options=options)
+    driver.set_page_load_timeout(page_load_timeout)
+    if block_resources:
+        enable_blocking(driver, blocked_types, blocked_patterns)
+    return driver
+
+
+@dataclass
+class PooledDriver:
+    driver: object
+    number: int
+    jobs: int = 0
+
+
+@dataclass
+class PoolStats:
+    started: int = 0
+    recycled: int = 0
+    crashed: int = 0
+    jobs: int = 0
+    startup_seconds: float = 0.0
+
+    def __str__(self):
+        return (f"{self.jobs} jobs on {self.started} drivers ({self.recycled} recycled, {self.crashed} crashed); "
+                f"startup took {self.startup_seconds:.1f}s")
+
+
+class DriverPool:
+    """Lease warm drivers to jobs; use as a context manager so every browser is quit at the end"""
+
+    def __init__(self, size=2, max_jobs=20, driver_factory=None, **driver_options):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.driver_factory = driver_factory or (lambda: new_chrome(**driver_options))
+        self.stats = PoolStats()
+        self._idle = queue.LifoQueue()
+        self._live = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        started = time.perf_counter()
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            with self._lock:
+                self._live -= 1
+            raise
+        with self._lock:
+            self.stats.started += 1
+            self.stats.startup_seconds += time.perf_counter() - started
+            return PooledDriver(driver, self.stats.started)
+
+    def warm(self):
+        """Start every driver up front, in parallel"""
+        with self._lock:
+            missing = self.size - self._live
+            self._live += missing
+        with ThreadPoolExecutor(max_workers=max(1, missing)) as executor:
+            for pooled in executor.map(lambda _: self._start(), range(missing)):
+                self._idle.put(pooled)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_start = self._live < self.size
+                if can_start:
+                    self._live += 1
+            if can_start:
+                return self._start()
+            try:
+                # Re-check now and then: a crashed driver frees a slot without returning to the queue
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _discard(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._live -= 1
+
+    def reset(self, driver):
+        """Back to a single blank tab with no cookies or storage from any site the job visited"""
+        handles = driver.window_handles
+        origins = set()
+        for handle in reversed(handles):
+            driver.switch_to.window(handle)
+            origins.add(origin_of(driver.current_url))
+            if handle != handles[0]:
+                driver.close()
+        driver.switch_to.window(handles[0])
+        driver.execute_script("try { sessionStorage.clear(); } catch (e) {}")
+        # delete_all_cookies() and localStorage.clear() only reach the current document's origin,
+        # which would leave the apply/ATS domains' cookies and storage to the next job
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in origins:
+            if origin:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin",
+                                       {"origin": origin, "storageTypes": CLEARED_STORAGE_TYPES})
+        driver.get("about:blank")
+
+    @contextmanager
+    def lease(self):
+        """Hand out a driver for one job and take it back afterwards"""
+        pooled = self._acquire()
+        healthy = True
+        try:
+            yield pooled.driver
+        except CRASH_ERRORS:
+            healthy = False
+            raise
+        finally:
+            pooled.jobs += 1
+            with self._lock:
+                self.stats.jobs += 1
+            if healthy:
+                try:
+                    self.reset(pooled.driver)
+                except WebDriverException:
+                    healthy = False
+            if not healthy:
+                with self._lock:
+                    self.stats.crashed += 1
+                self._discard(pooled)
+            elif pooled.jobs >= self.max_jobs:
+                with self._lock:
+                    self.stats.recycled += 1
+                self._discard(pooled)
+            else:
+                self._idle.put(pooled)
+
+    def run(self, items, job):
+        """Call job(driver, item) for every item across the pool; returns (item, result or exception) pairs"""
+        def run_one(item):
+            try:
+                with self.lease() as driver:
+                    return item, job(driver, item)
+            except Exception as e:
+                return item, e
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run_one, items))
+
+    def close(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming email extraction for the get_email_from_website functions.
+
+The page body is read in chunks and scanned as it arrives with a precompiled
+pattern. Every address is kept as a candidate together with where it was
+found (mailto: link, visible text or inside a <script>), scored against the
+site's own domain, and asset names or vendor/tracking addresses are dropped.
+Reading stops at max_bytes or at a mailto: link on the site's own domain, and
+responses that are not HTML/text are closed without downloading the body.
+"""
+
+import codecs
+import re
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?")
+TOKEN_PATTERN = re.compile(
+    r"(?P<script_open><script\b)|(?P<script_close></script\s*>)"
+    r"|(?P<mailto>mailto:)?(?P<email>" + EMAIL_PATTERN.pattern + ")",
+    re.IGNORECASE,
+)
+
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+DEFAULT_MAX_BYTES = 512 * 1024
+CHUNK_SIZE = 16 * 1024
+# Characters kept between chunks so an address split across two chunks is still matched
+OVERLAP = 256
+
+# "logo@2x.png" and friends match the pattern but are file names
+ASSET_SUFFIXES = ("png", "jpg", "jpeg", "gif", "svg", "webp", "avif", "ico", "bmp", "css", "js",
+                  "woff", "woff2", "ttf", "mp4", "webm", "pdf")
+VENDOR_DOMAINS = ("sentry.io", "wixpress.com", "wix.com", "squarespace.com", "godaddy.com", "cloudflare.com",
+                  "example.com", "example.org", "domain.com", "yourdomain.com", "email.com", "mysite.com")
+PLACEHOLDER_LOCALS = ("name", "user", "username", "your", "youremail", "email", "someone", "test")
+FREE_MAIL_DOMAINS = ("gmail.com", "outlook.com", "hotmail.com", "yahoo.com", "yahoo.com.au", "icloud.com",
+                     "live.com", "live.com.au", "bigpond.com", "bigpond.net.au", "optusnet.com.au", "me.com")
+ROLE_LOCALS = ("info", "hello", "contact", "enquiries", "enquiry", "bookings", "booking", "reservations",
+               "admin", "office", "jobs", "careers", "hr", "manager")
+
+SOURCE_SCORES = {"mailto": 3.0, "text": 2.0, "script": 0.5}
+SITE_DOMAIN_BONUS = 4.0
+# Good enough to send to, so the contact crawl can stop
+CONFIDENT_SCORE = 3.0
+# A mailto: link on the site's own domain; nothing later on the page can beat it
+HIGH_CONFIDENCE_SCORE = SOURCE_SCORES["mailto"] + SITE_DOMAIN_BONUS
+
+
+@dataclass
+class EmailCandidate:
+    address: str
+    source: str
+    score: float
+    position: int
+
+
+def site_domain(url):
+    host = urlparse(url or "").netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def _domain_matches(domain, site):
+    return bool(site) and (domain == site or domain.endswith("." + site) or site.endswith("." + domain))
+
+
+def score_email(address, source="text", site=""):
+    """Score an address for a site; None if it is an asset name, placeholder or vendor address"""
+    local, _, domain = address.lower().rpartition("@")
+    if domain.rsplit(".", 1)[-1] in ASSET_SUFFIXES:
+        return None
+    if any(domain == vendor or domain.endswith("." + vendor) for vendor in VENDOR_DOMAINS):
+        return None
+    if local in PLACEHOLDER_LOCALS or len(local) > 40:
+        return None
+
+    score = SOURCE_SCORES.get(source, 1.0)
+    if _domain_matches(domain, site):
+        score += SITE_DOMAIN_BONUS
+    elif domain in FREE_MAIL_DOMAINS:
+        score += 1.0
+    else:
+        score -= 0.5  # Someone else's business address, e.g. the web agency in the footer
+    if local in ROLE_LOCALS:
+        score += 0.5
+    return score
+
+
+def is_plausible_email(address):
+    """False for values that can never be a real recipient (assets, placeholders, vendors, junk)"""
+    return isinstance(address, str) and EMAIL_PATTERN.fullmatch(address.strip()) is not None \
+        and score_email(address.strip()) is not None
+
+
+def rank_candidates(candidates):
+    """Best first; ties keep document order"""
+    return sorted(candidates, key=lambda candidate: (-candidate.score, candidate.position))
+
+
+def format_candidates(candidates):
+    """Compact "address (source)" list stored next to the chosen email"""
+    return "; ".join(f"{candidate.address} ({candidate.source})" for candidate in candidates)
+
+
+def parse_candidates(value):
+    """Addresses of a stored candidate list, best first"""
+    if not isinstance(value, str):
+        return []
+    return [item.split(" (")[0].strip() for item in value.split(";") if item.strip()]
+
+
+def best_recipient(email, candidates=None):
+    """Address to send to: the first plausible stored candidate, else the email itself if plausible"""
+    for address in parse_candidates(candidates) + [email]:
+        if is_plausible_email(address):
+            return address.strip()
+    return None
+
+
+def is_text_response(response):
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    return not content_type or content_type in TEXT_CONTENT_TYPES
+
+
+def response_encoding(response):
+    """Charset the response declares, or utf-8 when it declares none or one Python does not know"""
+    encoding = response.encoding or "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return "utf-8"
+    return encoding
+
+
+def iter_emails(chunks, encoding="utf-8", max_bytes=DEFAULT_MAX_BYTES):
+    """Yield (email, source) in document order from a stream of byte chunks
+
+    source is "mailto", "script" (inside a <script> element) or "text".
+    """
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    in_script = False
+
+    def scan(text, final):
+        nonlocal in_script
+        # Tokens starting in the last OVERLAP characters wait for the next chunk
+        safe_end = len(text) if final else max(0, len(text) - OVERLAP)
+        resume = safe_end
+        found = []
+        for match in TOKEN_PATTERN.finditer(text):
+            if match.start() >= safe_end:
+                break
+            if not final and match.end() == len(text):
+                # The token may continue in the next chunk
+                resume = match.start()
+                break
+            resume = max(resume, match.end())
+            if match.group("script_open"):
+                in_script = True
+            elif match.group("script_close"):
+                in_script = False
+            else:
+                source = "mailto" if match.group("mailto") else "script" if in_script else "text"
+                found.append((match.group("email"), source))
+        return found, text[resume:]
+
+    pending = ""
+    read = 0
+    for chunk in chunks:
+        chunk = chunk[:max_bytes - read]
+        read += len(chunk)
+        final = read >= max_bytes
+        found, pending = scan(pending + decoder.decode(chunk, final=final), final)
+        yield from found
+        if final:
+            return
+
+    found, _ = scan(pending + decoder.decode(b"", final=True), True)
+    yield from found
+
+
+def read_candidates(response, site_url=None, max_bytes=DEFAULT_MAX_BYTES, body=None):
+    """Scan an open streamed response and return its ranked, filtered email candidates
+
+    If a bytearray is passed as body, the bytes read are appended to it so the
+    caller can look at the page afterwards without downloading it again.
+    """
+    site = site_domain(site_url or response.url)
+    chunks = response.iter_content(CHUNK_SIZE)
+    if body is not None:
+        chunks = _tee(chunks, body)
+    candidates = {}
+    for position, (email, source) in enumerate(iter_emails(chunks, response_encoding(response), max_bytes)):
+        score = score_email(email, source, site)
+        if score is None:
+            continue
+        key = email.lower()
+        if key not in candidates:
+            candidates[key] = EmailCandidate(email, source, score, position)
+        elif score > candidates[key].score:
+            candidates[key].source, candidates[key].score = source, score
+        if score >= HIGH_CONFIDENCE_SCORE:
+            break
+    return rank_candidates(candidates.values())
+
+
+def _tee(chunks, body):
+    for chunk in chunks:
+        body.extend(chunk)
+        yield chunk
+
+
+def extract_candidates(url, session=None, max_bytes=DEFAULT_MAX_BYTES, timeout=10):
+    """Ranked email candidates of a single page
+
+    Raises requests.RequestException like requests.get does.
+    """
+    if session is None:
+        # Imported here so the CLI's quick commands (suppression, stats) do not pay for requests
+        import requests as session
+    response = session.get(url, timeout=timeout, stream=True)
+    with response:
+        response.raise_for_status()
+        if not is_text_response(response):
+            return []
+        return read_candidates(response, url, max_bytes)
+
+
+def extract_email(url, session=None, max_bytes=DEFAULT_MAX_BYTES, timeout=10):
+    """Return the best-ranked address on the page, or None"""
+    candidates = extract_candidates(url, session, max_bytes, timeout)
+    return candidates[0].address if candidates else None
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-ins for the Places API, restaurant websites and Gmail SMTP.
+
+FakePlacesAPI answers Text Search and Place Details like Google does: 20
+results per page, at most three pages per query, and a next_page_token that
+is rejected with INVALID_REQUEST until token_delay seconds after it was
+issued. Every response is delayed by the injected latency. Details results
+point at SiteFleet, a set of synthetic cafe websites of different sizes whose
+address is on the homepage, only on the contact page or missing. SMTPSink
+accepts AUTH and counts the messages it receives.
+
+Every place, site and address is derived from a hash of its id, so runs with
+the same settings see the same data. The servers listen on 127.0.0.1 only.
+"""
+
+import hashlib
+import json
+import random
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+PAGE_SIZE = 20
+MAX_PAGES = 3
+
+# Homepage sizes of small, medium and large sites, in bytes
+SITE_SIZES = (4 * 1024, 40 * 1024, 250 * 1024)
+
+FILLER = ("Our baristas pull every shot with single origin beans roasted down the road. "
+          "Join us for brunch, seasonal specials and the best flat white in the neighbourhood. ")
+
+
+def stable_hash(value):
+    return int(hashlib.sha1(value.encode("utf-8")).hexdigest()[:12], 16)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _HTTPService:
+    """One ThreadingHTTPServer per port, each served from a daemon thread"""
+
+    def __init__(self, handler, ports=1):
+        self.servers = []
+        for _ in range(ports):
+            server = _Server(("127.0.0.1", 0), handler)
+            server.service = self
+            self.servers.append(server)
+
+    @property
+    def ports(self):
+        return [server.server_address[1] for server in self.servers]
+
+    def start(self):
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _PlacesHandler(_Handler):
+    def do_GET(self):
+        api = self.server.service
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        api.delay()
+        if url.path.endswith("/textsearch/json"):
+            data = api.text_search(params)
+        elif url.path.endswith("/details/json"):
+            data = api.details(params)
+        else:
+            self.send_body(404, "", "text/plain")
+            return
+        self.send_body(200, json.dumps(data), "application/json")
+
+
+class FakePlacesAPI(_HTTPService):
+    """Text Search and Place Details with Google's paging rules and injected latency
+
+    Each query yields results_per_query places (Google stops at 60).
+    no_website is the share of places whose Details result has no website.
+    """
+
+    def __init__(self, site_ports, results_per_query=60, latency=0.05, token_delay=1.5, no_website=0.1, seed=0):
+        super().__init__(_PlacesHandler)
+        self.site_ports = list(site_ports)
+        self.results_per_query = min(results_per_query, PAGE_SIZE * MAX_PAGES)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.no_website = no_website
+        self.seed = seed
+        self.requests = {"textsearch": 0, "details": 0, "invalid_token": 0}
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.ports[0]}/maps/api/place"
+
+    def delay(self):
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+    def _count(self, name):
+        with self._lock:
+            self.requests[name] += 1
+
+    def text_search(self, params):
+        self._count("textsearch")
+        token = params.get("pagetoken")
+        if token:
+            with self._lock:
+                issued = self._tokens.get(token)
+            if issued is None or time.monotonic() < issued[2]:
+                self._count("invalid_token")
+                return {"status": "INVALID_REQUEST", "results": []}
+            query, page = issued[0], issued[1]
+        else:
+            query, page = params.get("query", ""), 0
+
+        query_id = f"{stable_hash(f'{self.seed}:{query}'):x}"
+        first = page * PAGE_SIZE
+        results = [{
+            "place_id": f"{query_id}-{n}",
+            "name": f"{query.title()} Cafe {n}",
+            "formatted_address": f"{n} {query.title()} Street",
+        } for n in range(first, min(first + PAGE_SIZE, self.results_per_query))]
+        data = {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+        if first + PAGE_SIZE < self.results_per_query:
+            next_token = uuid.uuid4().hex
+            with self._lock:
+                self._tokens[next_token] = (query, page + 1, time.monotonic() + self.token_delay)
+            data["next_page_token"] = next_token
+        return data
+
+    def details(self, params):
+        self._count("details")
+        place_id = params.get("place_id", "")
+        h = stable_hash(place_id)
+        result = {}
+        if (h % 1000) / 1000 >= self.no_website:
+            port = self.site_ports[h % len(self.site_ports)]
+            result["website"] = f"http://127.0.0.1:{port}/{place_id}/"
+        result["opening_hours"] = {"weekday_text": [f"{day}: 7:00 AM – 4:00 PM" for day in
+                                                    ("Monday", "Tuesday", "Wednesday", "Thursday",
+                                                     "Friday", "Saturday", "Sunday")]}
+        return {"status": "OK", "result": result}
+
+
+def site_layout(site_id):
+    """(homepage size, where the address is, the address) of a synthetic site
+
+    Four in ten sites have a mailto: link on the homepage, three only mention
+    an address in the contact page text, two show it in the homepage footer
+    and one has none at all.
+    """
+    h = stable_hash(site_id)
+    size = SITE_SIZES[h % len(SITE_SIZES)]
+    kind = (h // 7) % 10
+    slug = site_id.replace("-", "")
+    if kind < 4:
+        return size, "homepage_mailto", f"{slug}@gmail.com"
+    if kind < 7:
+        return size, "contact_text", f"bookings@{slug}.com.au"
+    if kind < 9:
+        return size, "footer_text", f"hello@{slug}.com.au"
+    return size, "none", None
+
+
+def render_page(site_id, page):
+    size, placement, address = site_layout(site_id)
+    if page != "home":
+        size = 6 * 1024
+    nav = (f'<nav><a href="/{site_id}/">Home</a> <a href="/{site_id}/menu/">Menu</a> '
+           f'<a href="/{site_id}/about/">About us</a> <a href="/{site_id}/contact/">Contact</a></nav>')
+    contact = ""
+    if page == "home" and placement == "homepage_mailto":
+        contact = f'<p>Bookings: <a href="mailto:{address}">{address}</a></p>'
+    elif page == "contact" and placement == "contact_text":
+        contact = f"<p>Email us at {address} for bookings and enquiries.</p>"
+    footer = f"<footer>{address if placement == 'footer_text' else ''} &copy; {site_id}</footer>"
+    head = f"<html><head><title>{site_id} {page}</title></head><body>{nav}<h1>{page.title()}</h1>{contact}"
+    filler_count = max(0, (size - len(head) - len(footer)) // len(FILLER))
+    return head + "<p>" + FILLER * filler_count + "</p>" + footer + "</body></html>"
+
+
+class _SiteHandler(_Handler):
+    def do_GET(self):
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if not parts or len(parts) > 2 or (len(parts) == 2 and parts[1] not in ("menu", "about", "contact")):
+            self.send_body(404, "<html><body>Not found</body></html>", "text/html; charset=utf-8")
+            return
+        with self.server.service.lock:
+            self.server.service.pages += 1
+        self.send_body(200, render_page(parts[0], parts[1] if len(parts) == 2 else "home"),
+                       "text/html; charset=utf-8")
+
+
+class SiteFleet(_HTTPService):
+    """Synthetic restaurant websites, one path prefix per place, spread over several ports
+
+    The crawler limits concurrent requests per host:port, so the sites are
+    spread over ports to behave like many separate hosts.
+    """
+
+    def __init__(self, ports=16):
+        super().__init__(_SiteHandler, ports)
+        self.pages = 0
+        self.lock = threading.Lock()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        sink = self.server
+        reply = lambda line: self.wfile.write((line + "\r\n").encode("ascii"))
+        reply("220 sink ESMTP")
+        in_data = False
+        size = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    if sink.latency:
+                        time.sleep(sink.latency)
+                    with sink.lock:
+                        sink.messages += 1
+                        sink.bytes += size
+                    reply("250 2.0.0 queued")
+                else:
+                    size += len(line)
+                continue
+            command = line[:4].decode("ascii", errors="replace").upper()
+            if command == "EHLO":
+                self.wfile.write(b"250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif command == "AUTH":
+                reply("235 2.7.0 accepted")
+            elif command == "DATA":
+                in_data = True
+                size = 0
+                reply("354 go ahead")
+            elif command == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Plain SMTP server that accepts any login and discards messages after counting them"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 64
+
+    def __init__(self, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.latency = latency
+        self.messages = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def serve(config, queue=None, stop=None):
+    """Run all three services until stop (a threading/multiprocessing Event) is set
+
+    config holds the FakePlacesAPI keyword arguments plus site_ports and
+    smtp_latency. The addresses are put on queue (or printed) once the
+    servers accept connections, and the request counts when they stop.
+    """
+    config = dict(config)
+    fleet = SiteFleet(config.pop("site_ports", 16)).start()
+    sink = SMTPSink(config.pop("smtp_latency", 0.0)).start()
+    places = FakePlacesAPI(fleet.ports, **config).start()
+    addresses = {"places_url": places.base_url, "smtp_port": sink.port, "site_ports": fleet.ports}
+    if queue is not None:
+        queue.put(addresses)
+    else:
+        print(json.dumps(addresses), flush=True)
+    try:
+        if stop is None:
+            while True:
+                time.sleep(1.0)
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for service in (places, fleet, sink):
+            service.close()
+    counts = {"places_requests": places.requests, "site_pages": fleet.pages,
+              "smtp_messages": sink.messages, "smtp_bytes": sink.bytes}
+    if queue is not None:
+        queue.put(counts)
+    return counts
+
+
+if __name__ == "__main__":
+    # 使用例: python fake_services.py（Ctrl+Cで停止）
+    serve({})
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Record and replay the HTTP traffic of the collection scripts.
+
+While a Cassette is active every request sent through requests (the Text
+Search and Place Details calls and the contact page fetches) goes through
+HTTPAdapter.send, where it is either answered from the cassette or sent and
+stored. Requests are indexed by method, URL and sorted query parameters
+with the API key removed, so the key is never written to disk. Bodies are
+stored zlib-compressed in SQLite, and connection errors and timeouts are
+recorded too, so a replay fails in the same places the recording did.
+
+In replay mode the whole cassette is loaded into memory and a request that
+was never recorded raises CassetteMiss. The Place Details cache answers
+repeat lookups before they reach the network, so record a sweep with a
+fresh cache if every Details call should be on the cassette.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+
+DEFAULT_CASSETTE_PATH = "resume/http_cassette.sqlite"
+MODES = ("record", "replay", "auto")
+
+# Query parameters that are credentials, not part of the request's identity
+IGNORED_PARAMS = ("key",)
+# Headers that describe the original transfer rather than the stored body
+DROPPED_HEADERS = ("content-encoding", "transfer-encoding", "content-length", "set-cookie")
+
+# Requests per second allowed per Places endpoint while replaying
+REPLAY_RATE = 1_000_000.0
+
+CASSETTE_ENV = "LEADGEN_CASSETTE"
+CASSETTE_MODE_ENV = "LEADGEN_CASSETTE_MODE"
+
+
+class CassetteMiss(requests.ConnectionError):
+    """A replayed request that is not on the cassette"""
+
+
+def normalize_request(method, url, body=None):
+    """Cassette key of a request: method, lower-cased host, path and sorted query without the API key"""
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name not in IGNORED_PARAMS)
+    key = f"{method.upper()} {parts.scheme}://{parts.netloc.lower()}{parts.path or '/'}"
+    if query:
+        key += "?" + urlencode(query)
+    if body:
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        key += " #" + hashlib.sha1(body).hexdigest()
+    return key
+
+
+class Cassette:
+    """On-disk store of HTTP responses keyed by normalize_request
+
+    mode="record" sends every request and stores the response, "replay"
+    answers only from the cassette and "auto" replays what is there and
+    records the rest. Use it as a context manager to route requests through it.
+    """
+
+    def __init__(self, path=DEFAULT_CASSETTE_PATH, mode="replay"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {', '.join(MODES)}")
+        if mode == "replay" and not os.path.exists(path):
+            raise FileNotFoundError(f"No cassette to replay at {path}")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB,
+                error TEXT,
+                elapsed REAL NOT NULL,
+                recorded_at REAL NOT NULL
+            );
+        """)
+        self._entries = {}
+        self._recorded_keys = set()
+        if mode != "record":
+            for key, *entry in self._conn.execute("SELECT key, status, headers, body, error, elapsed FROM responses"):
+                self._entries[key] = tuple(entry)
+
+    def __len__(self):
+        # Loaded plus recorded responses, so it still works after close()
+        with self._lock:
+            return len(self._recorded_keys.union(self._entries))
+
+    def send(self, adapter, request, **kwargs):
+        """Answer a prepared request from the cassette or send and record it"""
+        key = normalize_request(request.method, request.url, request.body)
+        if self.mode != "record":
+            with self._lock:
+                entry = self._entries.get(key)
+                self.hits += entry is not None
+                self.misses += entry is None
+            if entry is not None:
+                return self._replay(adapter, request, entry)
+            if self.mode == "replay":
+                raise CassetteMiss(f"Not on the cassette: {key}", request=request)
+        return self._record(adapter, request, key, kwargs)
+
+    def _record(self, adapter, request, key, kwargs):
+        started = time.perf_counter()
+        try:
+            response = _original_send(adapter, request, **kwargs)
+            body = response.content
+        except requests.RequestException as e:
+            entry = (0, "{}", None, f"{type(e).__name__}: {e}", time.perf_counter() - started)
+        else:
+            headers = {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS}
+            entry = (response.status_code, json.dumps(headers), zlib.compress(body), None,
+                     response.elapsed.total_seconds())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, status, headers, body, error, elapsed, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, *entry, time.time()),
+            )
+            self.recorded += 1
+            self._recorded_keys.add(key)
+        # Not added to _entries: a retry in this run (e.g. a page token that was not ready) must go
+        # out again. The stored copy is returned so recording and replay look the same downstream.
+        return self._replay(adapter, request, entry)
+
+    def _replay(self, adapter, request, entry):
+        status, headers, body, error, elapsed = entry
+        if error:
+            name, _, message = error.partition(": ")
+            error_type = requests.Timeout if "Timeout" in name else requests.ConnectionError
+            raise error_type(message, request=request)
+        content = zlib.decompress(body)
+        headers = dict(json.loads(headers), **{"Content-Length": str(len(content))})
+        raw = HTTPResponse(body=io.BytesIO(content), headers=headers, status=status,
+                           preload_content=False, decode_content=False)
+        response = adapter.build_response(request, raw)
+        response.elapsed = timedelta(seconds=elapsed)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode, "loaded": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "recorded": self.recorded}
+
+    def __enter__(self):
+        install(self)
+        return self
+
+    def __exit__(self, *exc):
+        uninstall(self)
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_original_send = HTTPAdapter.send
+_active = None
+_active_lock = threading.Lock()
+
+
+def _cassette_send(adapter, request, **kwargs):
+    cassette = _active
+    if cassette is None:
+        return _original_send(adapter, request, **kwargs)
+    return cassette.send(adapter, request, **kwargs)
+
+
+def install(cassette):
+    """Route every requests call in the process through cassette"""
+    global _active
+    with _active_lock:
+        if _active is not None:
+            raise RuntimeError(f"A cassette is already active ({_active.path})")
+        _active = cassette
+        HTTPAdapter.send = _cassette_send
+
+
+def uninstall(cassette):
+    global _active
+    with _active_lock:
+        if _active is cassette:
+            _active = None
+            HTTPAdapter.send = _original_send
+
+
+def cassette_from_env(path=None, mode=None):
+    """Cassette at path in mode, by default $LEADGEN_CASSETTE in $LEADGEN_CASSETTE_MODE (default replay)
+
+    Returns a no-op context when no cassette is named. Nothing reaches Google
+    during a replay, so the per-second quotas of the Places endpoints are
+    lifted for it.
+    """
+    path = path or os.environ.get(CASSETTE_ENV)
+    if not path:
+        return nullcontext()
+    mode = mode or os.environ.get(CASSETTE_MODE_ENV, "replay")
+    if mode == "replay":
+        from rate_limit import get_rate_limiter
+
+        get_rate_limiter().set_rates(textsearch=REPLAY_RATE, details=REPLAY_RATE)
+    print(f"HTTP cassette {path} ({mode})")
+    return Cassette(path, mode)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indeed search harvester for the apply_automation queue.
+
+Each results page is read with a single injected script that returns every
+job card (job key, title, company, location, apply type, URL) together with
+the next-page link, instead of one WebDriver round trip per element. Pages
+are followed until there is no next page, max_pages is reached or a page
+adds nothing new, and the cards are written to the ListingStore.
+"""
+
+from dataclasses import dataclass, field
+from urllib.parse import urlencode, urljoin
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from listing_store import ListingStore
+from perf_metrics import instrument
+from waits import wait_for
+
+
+INDEED_URL = "https://www.indeed.com/"
+
+EXTRACT_CARDS_JS = """
+const text = (root, selector) => {
+    const el = root.querySelector(selector);
+    return el ? el.textContent.trim() : null;
+};
+const cards = [];
+for (const card of document.querySelectorAll(".job_seen_beacon")) {
+    const link = card.querySelector("a[data-jk]");
+    if (!link) continue;
+    const title = card.querySelector("h2.jobTitle span[title]");
+    cards.push({
+        job_key: link.getAttribute("data-jk"),
+        title: title ? title.getAttribute("title") : text(card, "h2.jobTitle"),
+        company: text(card, "[data-testid='company-name']"),
+        location: text(card, "[data-testid='text-location']"),
+        apply_type: card.querySelector(".iaLabel, [data-testid='indeedApply']") ? "indeed_apply" : "external",
+        url: link.href,
+    });
+}
+const next = document.querySelector("a[data-testid='pagination-page-next']");
+return {cards: cards, next: next ? next.href : null};
+"""
+
+
+@dataclass
+class HarvestReport:
+    query: str
+    pages: int = 0
+    cards: int = 0
+    new_listings: int = 0
+    page_urls: list = field(default_factory=list)
+
+    def __str__(self):
+        return f"{self.query}: {self.cards} cards on {self.pages} pages, {self.new_listings} new listings"
+
+
+def search_url(what, where, start=0):
+    params = {"q": what, "l": where}
+    if start:
+        params["start"] = start
+    return urljoin(INDEED_URL, "jobs?" + urlencode(params))
+
+
+def extract_cards(driver):
+    """All job cards and the next-page URL of the current results page, in one script call"""
+    result = driver.execute_script(EXTRACT_CARDS_JS) or {}
+    return result.get("cards") or [], result.get("next")
+
+
+@instrument("selenium.harvest")
+def harvest(driver, what, where, store, max_pages=10):
+    """Page through the results of one search and add every card to store"""
+    report = HarvestReport(f"{what} in {where}")
+    url = search_url(what, where)
+    seen = set()
+    while url and report.pages < max_pages:
+        driver.get(url)
+        try:
+            wait_for(driver, "search_results", EC.presence_of_element_located((By.CLASS_NAME, "job_seen_beacon")))
+        except TimeoutException:
+            break
+        cards, next_url = extract_cards(driver)
+        report.pages += 1
+        report.page_urls.append(url)
+        fresh = [card for card in cards if card["job_key"] not in seen]
+        if not fresh:
+            # Indeed repeats the last page when start= runs past the end
+            break
+        for card in fresh:
+            seen.add(card["job_key"])
+            card["query"] = report.query
+        report.cards += len(fresh)
+        report.new_listings += store.add_many(fresh)
+        url = next_url
+    print(report)
+    return report
+
+
+def harvest_many(pool, searches, store=None, max_pages=10):
+    """Harvest several (what, where) searches in parallel across a DriverPool"""
+    if store is None:
+        store = ListingStore()
+    results = pool.run(searches, lambda driver, search: harvest(driver, search[0], search[1], store, max_pages))
+    for search, result in results:
+        if isinstance(result, Exception):
+            print(f"Harvest failed for {search}: {result}")
+    return [result for _, result in results if isinstance(result, HarvestReport)]
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite lead table shared by the ExcelAutomation and EmailSending scripts.
+
+Leads are upserted on (name, address), so saving a sweep only touches the new
+rows, and sending flips execution_flag one row at a time. The succeed/failed
+workbook layout is produced on demand with export_to_excel.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_DB_PATH = "resume/leads.sqlite"
+
+LEAD_COLUMNS = ["name", "address", "website", "email", "opening_hours", "closed_days", "email_candidates"]
+SUCCEED_COLUMNS = ["name", "address", "website", "email", "email_candidates", "execution_flag"]
+FAILED_COLUMNS = ["name", "address", "website", "email", "email_candidates"]
+
+
+def has_email(value):
+    """Same rule the workbooks use to split leads into succeed / failed"""
+    return isinstance(value, str) and "@" in value
+
+
+class LeadStore:
+    """Indexed lead table with upserts keyed on (name, address)"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                address TEXT NOT NULL DEFAULT '',
+                website TEXT,
+                email TEXT,
+                opening_hours TEXT,
+                closed_days TEXT,
+                email_candidates TEXT,
+                execution_flag INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (name, address)
+            );
+            CREATE INDEX IF NOT EXISTS idx_leads_unsent ON leads (execution_flag, email);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(leads)")}
+        if "email_candidates" not in columns:
+            self._conn.execute("ALTER TABLE leads ADD COLUMN email_candidates TEXT")
+
+    def upsert_many(self, entries):
+        """Insert new leads and refresh contact fields of known ones; returns the number inserted"""
+        now = time.time()
+        rows = [
+            (entry.get("name"), entry.get("address") or "",
+             *(entry.get(column) for column in LEAD_COLUMNS[2:]),
+             bool(entry.get("execution_flag", False)), now, now)
+            for entry in entries if entry.get("name")
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO leads (name, address, website, email, opening_hours, closed_days,"
+                " email_candidates, execution_flag, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            # Known leads keep their execution_flag; only fill in newer contact details
+            self._conn.executemany(
+                "UPDATE leads SET website = COALESCE(?, website),"
+                " email = CASE WHEN ? LIKE '%@%' THEN ? ELSE COALESCE(email, ?) END,"
+                " opening_hours = COALESCE(?, opening_hours), closed_days = COALESCE(?, closed_days),"
+                " email_candidates = COALESCE(NULLIF(?, ''), email_candidates),"
+                " updated_at = ? WHERE name = ? AND address = ? AND created_at != ?",
+                [(row[2], row[3], row[3], row[3], row[4], row[5], row[6], now, row[0], row[1], now) for row in rows],
+            )
+        return inserted
+
+    def names(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM leads")]
+
+    def unsent(self):
+        """Leads with an email address that have not been sent an application yet"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM leads WHERE execution_flag = 0 AND email LIKE '%@%' ORDER BY id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def without_email(self):
+        """Leads in the failed layout that at least have a website to look at"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM leads WHERE (email IS NULL OR email NOT LIKE '%@%') AND website LIKE 'http%' ORDER BY id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_unsent(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM leads WHERE execution_flag = 0 AND email LIKE '%@%'"
+            ).fetchone()[0]
+
+    def counts(self):
+        """Number of leads in total, with an email address, still to send and already sent"""
+        with self._lock:
+            total, with_email, unsent, sent = self._conn.execute(
+                "SELECT COUNT(*), SUM(email LIKE '%@%'), SUM(execution_flag = 0 AND email LIKE '%@%'),"
+                " SUM(execution_flag != 0) FROM leads"
+            ).fetchone()
+        return {"total": total, "with_email": with_email or 0, "unsent": unsent or 0, "sent": sent or 0}
+
+    def mark_sent(self, lead_ids):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE leads SET execution_flag = 1, updated_at = ? WHERE id = ?",
+                [(time.time(), lead_id) for lead_id in lead_ids],
+            )
+
+    def import_excel(self, filename):
+        """One-off migration of an existing succeed/failed (or single sheet) workbook"""
+        import pandas as pd
+
+        inserted = 0
+        for df in pd.read_excel(filename, sheet_name=None).values():
+            df = df.astype(object).where(df.notna(), None)
+            inserted += self.upsert_many(df.to_dict("records"))
+        return inserted
+
+    def export_to_excel(self, filename="resume/places_data.xlsx"):
+        """Write the whole store in the succeed/failed workbook layout"""
+        import pandas as pd
+
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute("SELECT * FROM leads ORDER BY id")]
+        succeed = [row for row in rows if has_email(row["email"])]
+        failed = [row for row in rows if not has_email(row["email"])]
+        for row in succeed:
+            row["execution_flag"] = bool(row["execution_flag"])
+
+        with pd.ExcelWriter(filename) as writer:
+            pd.DataFrame(succeed, columns=SUCCEED_COLUMNS).to_excel(writer, index=False, sheet_name="succeed")
+            pd.DataFrame(failed, columns=FAILED_COLUMNS).to_excel(writer, index=False, sheet_name="failed")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
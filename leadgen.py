@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command-line entry point for the lead generation and application scripts.
+
+    python leadgen.py collect   # Places sweep into the lead store
+    python leadgen.py save      # export the lead store to the succeed/failed workbook
+    python leadgen.py send      # send the profile's cover letter to every unsent lead
+    python leadgen.py apply     # harvest Indeed searches and apply to the Indeed Apply listings
+    python leadgen.py stats     # lead, listing and suppression counts
+
+Settings come from DEFAULT_CONFIG, then the JSON file given with --config
+(leadgen.json in the current directory if there is one), then the flags.
+Only the standard library is imported at startup; pandas, requests and
+Selenium are imported by the subcommands that use them, so stats and other
+quick commands start fast enough to be polled by a scheduler.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+
+DEFAULT_CONFIG_PATH = "leadgen.json"
+
+DEFAULT_CONFIG = {
+    "api_key": None,  # my_gmail_account.api_key when not set
+    "gmail_account": None,  # my_gmail_account.account and .password when not set
+    "gmail_password": None,
+    "db": "resume/leads.sqlite",
+    "workbook": None,  # resume/places_data.xlsx for save, the profile's leads workbook for send
+    "profile": "profiles/cafe_barista.json",
+    "categories": ["Cafe", "Restaurant"],
+    "locations": ["Dandenong", "Murrumbeena", "CBD"],
+    "max_results": 60,
+    "max_api_calls": 1000,
+    "query_workers": 4,
+    "details_limit": 8,
+    "scrape_limit": 8,
+    "cassette": None,
+    "cassette_mode": None,
+    "source": "store",
+    "connections": 3,
+    "per_minute": 20,
+    "per_day": 500,
+    "searches": [["Software Engineer", "Remote"]],
+    "listings": "resume/listings.sqlite",
+    "max_pages": 5,
+    "pool_size": 3,
+    "chromedriver_path": None,
+    "suppression": "resume/suppression.sqlite",
+}
+
+
+def load_config(path=None):
+    """DEFAULT_CONFIG updated with the JSON config file, if any"""
+    config = dict(DEFAULT_CONFIG)
+    if path is None and os.path.exists(DEFAULT_CONFIG_PATH):
+        path = DEFAULT_CONFIG_PATH
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(DEFAULT_CONFIG))
+        if unknown:
+            raise ValueError(f"Unknown settings in {path}: {', '.join(unknown)}")
+        config.update(overrides)
+    return config
+
+
+def api_key(config):
+    if config["api_key"]:
+        return config["api_key"]
+    import my_gmail_account as gmail
+
+    return gmail.api_key
+
+
+def write_metrics(command):
+    from perf_metrics import get_metrics
+
+    get_metrics().print_summary()
+    get_metrics().write_reports(f"resume/{command}_metrics")
+
+
+def cmd_collect(config):
+    from http_cassette import cassette_from_env
+    from lead_store import LeadStore
+    from places_api import get_details_client
+    from rate_limit import QuotaBudget, get_rate_limiter
+    from sweep import run_sweep
+
+    key = api_key(config)
+    store = LeadStore(config["db"])
+    try:
+        with cassette_from_env(config["cassette"], config["cassette_mode"]) as cassette:
+            report = run_sweep(config["categories"], config["locations"], key, store=store,
+                               budget=QuotaBudget(max_calls=config["max_api_calls"]),
+                               query_workers=config["query_workers"], max_results=config["max_results"],
+                               details_limit=config["details_limit"], scrape_limit=config["scrape_limit"])
+        report.print_summary()
+        if cassette is not None:
+            print(f"HTTP cassette: {cassette.stats()}")
+        print(f"Place Details cache: {get_details_client(key).cache.stats()}")
+        print(f"next_page_token delays: {get_rate_limiter().page_token_stats()}")
+    finally:
+        store.close()
+    write_metrics("collect")
+    return 0
+
+
+def cmd_save(config):
+    from lead_store import LeadStore
+
+    store = LeadStore(config["db"])
+    try:
+        if config.get("import_workbook"):
+            print(f"Imported {store.import_excel(config['import_workbook'])} leads from {config['import_workbook']}")
+        else:
+            workbook = config["workbook"] or "resume/places_data.xlsx"
+            store.export_to_excel(workbook)
+            print(f"Wrote {workbook}")
+        print(store.counts())
+    finally:
+        store.close()
+    return 0
+
+
+def cmd_send(config):
+    from cover_letter import load_profile
+    from EmailSending import send_applications_from_excel, send_applications_from_store
+
+    profile = load_profile(config["profile"])
+    options = {"connections": config["connections"], "per_minute": config["per_minute"], "per_day": config["per_day"]}
+    if config["gmail_account"]:
+        options["account"] = (config["gmail_account"], config["gmail_password"])
+    if config["source"] == "workbook":
+        filename = config["workbook"] or profile.leads
+        send_applications_from_excel(profile, filename, suppression=_suppression(config, [filename]), **options)
+    else:
+        send_applications_from_store(config["db"], profile, suppression=_suppression(config), **options)
+    write_metrics("send")
+    return 0
+
+
+def _suppression(config, filenames=()):
+    from EmailSending import load_suppression
+    from suppression import DEFAULT_SUPPRESSION_PATH, SuppressionList
+
+    if config["suppression"] == DEFAULT_SUPPRESSION_PATH:
+        # Seeds the list from the known workbooks the first time, like the send scripts do
+        return load_suppression(filenames)
+    return SuppressionList(config["suppression"])
+
+
+def cmd_apply(config):
+    from apply_automation import apply_to_listings
+    from driver_pool import DriverPool
+    from indeed_harvester import harvest_many
+    from listing_store import ListingStore
+    from waits import get_wait_recorder
+
+    store = ListingStore(config["listings"])
+    try:
+        with DriverPool(size=config["pool_size"], max_jobs=20, chromedriver_path=config["chromedriver_path"],
+                        block_resources=True) as pool:
+            pool.warm()
+            harvest_many(pool, [tuple(search) for search in config["searches"]], store, max_pages=config["max_pages"])
+            apply_to_listings(store.pending(apply_type="indeed_apply"), pool, store)
+        print(store.counts())
+    finally:
+        store.close()
+    get_wait_recorder().print_summary()
+    get_wait_recorder().write_json("resume/apply_wait_timings.json")
+    write_metrics("apply")
+    return 0
+
+
+def cmd_stats(config):
+    # Only opens stores that exist, so polling never creates empty databases
+    stats = {}
+    if os.path.exists(config["db"]):
+        from lead_store import LeadStore
+
+        store = LeadStore(config["db"])
+        stats["leads"] = store.counts()
+        store.close()
+    if os.path.exists(config["listings"]):
+        from listing_store import ListingStore
+
+        store = ListingStore(config["listings"])
+        stats["listings"] = store.counts()
+        store.close()
+    if os.path.exists(config["suppression"]):
+        from suppression import SuppressionList
+
+        suppression = SuppressionList(config["suppression"])
+        stats["suppressed"] = len(suppression)
+        suppression.close()
+    if config.get("json"):
+        print(json.dumps(stats))
+    else:
+        for name, value in stats.items():
+            print(f"{name}: {value}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="leadgen", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", help=f"JSON settings file (default: {DEFAULT_CONFIG_PATH} if present)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    # Flags that are not given stay out of the namespace, so they never override the config file
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument("--db", help="lead store (SQLite)")
+
+    collect = commands.add_parser("collect", parents=[common], argument_default=argparse.SUPPRESS,
+                                  help="run a Places sweep into the lead store")
+    collect.add_argument("--category", dest="categories", action="append", help="repeat for several")
+    collect.add_argument("--location", dest="locations", action="append", help="repeat for several")
+    collect.add_argument("--api-key", dest="api_key")
+    collect.add_argument("--max-results", type=int, help="places per query")
+    collect.add_argument("--max-api-calls", type=int, help="Places calls for the whole sweep")
+    collect.add_argument("--query-workers", type=int)
+    collect.add_argument("--details-limit", type=int)
+    collect.add_argument("--scrape-limit", type=int)
+    collect.add_argument("--cassette", help="record/replay HTTP traffic with this cassette")
+    collect.add_argument("--cassette-mode", choices=("record", "replay", "auto"))
+    collect.set_defaults(func=cmd_collect)
+
+    save = commands.add_parser("save", parents=[common], argument_default=argparse.SUPPRESS,
+                               help="export the lead store to the succeed/failed workbook")
+    save.add_argument("--workbook", help="output workbook (default: resume/places_data.xlsx)")
+    save.add_argument("--import", dest="import_workbook", metavar="WORKBOOK",
+                      help="import a workbook into the store instead")
+    save.set_defaults(func=cmd_save)
+
+    send = commands.add_parser("send", parents=[common], argument_default=argparse.SUPPRESS,
+                               help="send the cover letter to every unsent lead")
+    send.add_argument("--profile", help="applicant profile JSON")
+    send.add_argument("--source", choices=("store", "workbook"), help="read leads from the store or a workbook")
+    send.add_argument("--workbook", help="leads workbook for --source workbook (default: the profile's)")
+    send.add_argument("--connections", type=int)
+    send.add_argument("--per-minute", type=int)
+    send.add_argument("--per-day", type=int)
+    send.add_argument("--suppression", help="suppression list (SQLite)")
+    send.set_defaults(func=cmd_send)
+
+    apply = commands.add_parser("apply", argument_default=argparse.SUPPRESS,
+                                help="harvest Indeed searches and apply to the Indeed Apply listings")
+    apply.add_argument("--search", dest="searches", nargs=2, action="append", metavar=("WHAT", "WHERE"))
+    apply.add_argument("--listings", help="listing store (SQLite)")
+    apply.add_argument("--max-pages", type=int)
+    apply.add_argument("--pool-size", type=int)
+    apply.add_argument("--chromedriver-path")
+    apply.set_defaults(func=cmd_apply)
+
+    stats = commands.add_parser("stats", parents=[common], argument_default=argparse.SUPPRESS,
+                                help="lead, listing and suppression counts")
+    stats.add_argument("--listings", help="listing store (SQLite)")
+    stats.add_argument("--suppression", help="suppression list (SQLite)")
+    stats.add_argument("--json", action="store_true", help="print one JSON object")
+    stats.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None):
+    args = vars(build_parser().parse_args(argv))
+    func = args.pop("func")
+    config_path = args.pop("config")
+    args.pop("command")
+    try:
+        config = load_config(config_path)
+    except (OSError, ValueError) as e:
+        print(f"leadgen: {e}", file=sys.stderr)
+        return 2
+    config.update(args)
+    try:
+        return func(config)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
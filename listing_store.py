@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite table of harvested Indeed listings, used as the apply queue.
+
+Listings are keyed on Indeed's job key, so harvesting the same search again
+only adds the new cards. The apply stage takes pending listings with
+pending() and records the outcome of each one with mark().
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_LISTINGS_PATH = "resume/listings.sqlite"
+
+LISTING_COLUMNS = ["job_key", "title", "company", "location", "apply_type", "url", "query"]
+
+
+class ListingStore:
+    """Job listings deduplicated on job_key, with an apply status per listing"""
+
+    def __init__(self, path=DEFAULT_LISTINGS_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS listings (
+                job_key TEXT PRIMARY KEY,
+                title TEXT,
+                company TEXT,
+                location TEXT,
+                apply_type TEXT,
+                url TEXT NOT NULL,
+                query TEXT,
+                status TEXT NOT NULL DEFAULT 'new',
+                harvested_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_listings_status ON listings (status, apply_type);
+        """)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def add_many(self, listings):
+        """Insert listings not seen before; returns the number inserted"""
+        now = time.time()
+        rows = [
+            (*(listing.get(column) for column in LISTING_COLUMNS), now, now)
+            for listing in listings if listing.get("job_key") and listing.get("url")
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.executemany(
+                "INSERT OR IGNORE INTO listings (job_key, title, company, location, apply_type, url, query,"
+                " harvested_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+
+    def pending(self, apply_type=None, limit=None):
+        """Listings not processed yet, oldest first, optionally only one apply type"""
+        sql = "SELECT * FROM listings WHERE status = 'new'"
+        params = []
+        if apply_type:
+            sql += " AND apply_type = ?"
+            params.append(apply_type)
+        sql += " ORDER BY harvested_at, job_key"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def mark(self, job_key, status):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE listings SET status = ?, updated_at = ? WHERE job_key = ?",
+                (status, time.time(), job_key),
+            )
+
+    def counts(self):
+        """Number of listings per status"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM listings GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage timings and counters for the search, scrape, persist and send scripts.
+
+Stages are timed with the @instrument decorator or the timer() context
+manager. Each stage keeps a latency histogram, call and error counts and the
+bytes it transferred. A run writes its metrics as a JSON report and in the
+Prometheus text exposition format, e.g. for node_exporter's textfile
+collector.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds, from a cached lookup up to a slow Selenium step
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "leadgen"
+
+
+class StageMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+
+    def observe(self, seconds, error=False):
+        self.calls += 1
+        self.errors += error
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the max for the +Inf bucket)"""
+        if not self.calls:
+            return 0.0
+        rank = fraction * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(LATENCY_BUCKETS[i], self.max) if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "mean": self.seconds / self.calls if self.calls else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            "histogram": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], self.buckets)),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of StageMetrics by stage name"""
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageMetrics()
+        return self.stages[name]
+
+    def observe(self, stage, seconds, error=False):
+        with self._lock:
+            self._stage(stage).observe(seconds, error)
+
+    def add_bytes(self, stage, n):
+        with self._lock:
+            self._stage(stage).bytes += n
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the block; an exception counts as an error and is re-raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - started, error=True)
+            raise
+        self.observe(stage, time.perf_counter() - started)
+
+    def report(self):
+        with self._lock:
+            stages = {name: stage.summary() for name, stage in self.stages.items()}
+        wall = time.time() - self.started
+        return {
+            "started": self.started,
+            "wall_seconds": wall,
+            # Stages overlap when they run on threads, so shares can add up to more than 1
+            "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["seconds"])),
+            "share_of_wall": {name: stage["seconds"] / wall if wall else 0.0 for name, stage in stages.items()},
+        }
+
+    def prometheus_text(self):
+        """All stages in the Prometheus text exposition format"""
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Latency of each pipeline stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            stages = sorted(self.stages.items())
+            for stage, metrics in stages:
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], metrics.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {metrics.seconds}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {metrics.calls}')
+            for metric, attribute, help_text in (("errors_total", "errors", "Failed calls of each stage."),
+                                                 ("bytes_total", "bytes", "Bytes transferred by each stage.")):
+                full = f"{METRIC_PREFIX}_stage_{metric}"
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} counter"]
+                lines += [f'{full}{{stage="{stage}"}} {getattr(metrics, attribute)}' for stage, metrics in stages]
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, basename="resume/run_metrics"):
+        """Write <basename>.json and <basename>.prom"""
+        if os.path.dirname(basename):
+            os.makedirs(os.path.dirname(basename), exist_ok=True)
+        with open(basename + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        with open(basename + ".prom", "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def print_summary(self):
+        report = self.report()
+        for name, stage in report["stages"].items():
+            print(f"{name}: {stage['calls']} calls, {stage['errors']} errors, {stage['seconds']:.1f}s total "
+                  f"(p50 {stage['p50']:.3f}s, p90 {stage['p90']:.3f}s), {stage['bytes'] / 1024:.0f}KiB")
+
+
+_default_metrics = Metrics()
+
+
+def get_metrics():
+    """Process-wide metrics shared by every script"""
+    return _default_metrics
+
+
+def instrument(stage, is_error=None):
+    """Decorator timing every call of a function as stage
+
+    is_error(result) marks calls that report failure through their return
+    value (e.g. "Error: ..." strings or False) instead of raising.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                _default_metrics.observe(stage, time.perf_counter() - started, error=True)
+                raise
+            _default_metrics.observe(stage, time.perf_counter() - started,
+                                     error=bool(is_error and is_error(result)))
+            return result
+        return wrapper
+    return decorate
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent SQLite cache for Place Details fields.
+
+Rows are keyed by (place_id, field) so a lookup is a hit only when every
+requested field is present and younger than its TTL. The least recently used
+rows are evicted once the cache grows past max_entries. Lookups never write:
+hits only note their access time, and the access times and new rows are
+committed together every commit_every puts, on flush() and at exit.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CACHE_PATH = "resume/place_details_cache.sqlite"
+
+DAY = 24 * 60 * 60
+DEFAULT_TTLS = {
+    "website": 30 * DAY,
+    "opening_hours": 7 * DAY,
+}
+
+
+class PlaceCache:
+    """Place Details cache with per-field TTLs, LRU eviction and hit/miss counters"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, default_ttl=14 * DAY,
+                 max_entries=100_000, evict_every=100, commit_every=50):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._uncommitted = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS details (
+                place_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (place_id, field)
+            );
+            CREATE INDEX IF NOT EXISTS idx_details_accessed ON details (accessed_at);
+        """)
+        atexit.register(self.flush)
+
+    def ttl(self, field):
+        return self.ttls.get(field, self.default_ttl)
+
+    def get(self, place_id, fields):
+        """Return {field: value} if every field is cached and fresh, otherwise None"""
+        fields = sorted(fields)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT field, value, fetched_at FROM details WHERE place_id = ? AND field IN ({','.join('?' * len(fields))})",
+                [place_id, *fields],
+            ).fetchall()
+            values = {field: json.loads(value) for field, value, fetched_at in rows
+                      if now - fetched_at < self.ttl(field)}
+            if len(values) < len(fields):
+                self.misses += 1
+                return None
+            self._touched[place_id] = now
+            self.hits += 1
+            return values
+
+    def put(self, place_id, values):
+        """Store the given field values for a place"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO details (place_id, field, value, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                [(place_id, field, json.dumps(value), now, now) for field, value in values.items()],
+            )
+            self._touched.pop(place_id, None)
+            self._puts += 1
+            self._uncommitted += 1
+            if self._puts % self.evict_every == 0:
+                self._evict()
+            elif self._uncommitted >= self.commit_every:
+                self._commit()
+
+    def _commit(self):
+        if self._touched:
+            self._conn.executemany("UPDATE details SET accessed_at = ? WHERE place_id = ?",
+                                   [(accessed, place_id) for place_id, accessed in self._touched.items()])
+            self._touched.clear()
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def flush(self):
+        """Write the buffered access times and commit the pending rows"""
+        with self._lock:
+            try:
+                self._commit()
+            except sqlite3.ProgrammingError:
+                pass  # already closed
+
+    def _evict(self):
+        self._commit()  # so the LRU order includes the buffered access times
+        count = self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            # Trim a little below the limit so we do not evict on every put
+            excess += self.max_entries // 10
+            cursor = self._conn.execute(
+                "DELETE FROM details WHERE rowid IN (SELECT rowid FROM details ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            self._conn.commit()
+            self.evictions += cursor.rowcount
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
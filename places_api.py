@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared Google Places Details client for the ExcelAutomation scripts.
+
+Every field a script needs for a place is fetched with a single Details call,
+concurrent lookups of the same place_id share that call, and results are kept
+in the on-disk PlaceCache so repeat sweeps skip places resolved earlier.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import requests
+
+from perf_metrics import get_metrics
+from place_cache import DEFAULT_CACHE_PATH, PlaceCache
+from rate_limit import get_rate_limiter
+
+
+TEXT_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+
+# Statuses that mean "try the same request again shortly"
+RETRY_STATUSES = {"OVER_QUERY_LIMIT"}
+# Details statuses that describe the place itself, so their result is cached (NOT_FOUND as no website)
+CACHED_STATUSES = {"OK", "NOT_FOUND"}
+
+
+@dataclass
+class PlaceDetails:
+    """Parsed Place Details result shared by the website and hours parsers"""
+    place_id: str
+    fields: frozenset
+    website: str | None = None
+    weekday_text: list = field(default_factory=list)
+    ok: bool = True
+
+
+class PlaceDetailsClient:
+    """Place Details client that coalesces field masks and in-flight requests"""
+
+    def __init__(self, api_key, fields=("website",), session=None, cache=None, budget=None, limiter=None):
+        self.api_key = api_key
+        self.fields = set(fields)
+        self.session = session or requests.Session()
+        self.cache = cache
+        self.budget = budget
+        self.limiter = limiter or get_rate_limiter()
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        self._results = {}
+        self._in_flight = {}
+
+    def require(self, *fields):
+        """Add fields to the mask requested for every place"""
+        with self._lock:
+            self.fields.update(fields)
+
+    def get(self, place_id, fields=(), budget=None):
+        """Return the details of a place, making at most one API call for it
+
+        The call is charged to budget, or to the client's own budget when none is given.
+        """
+        with self._lock:
+            wanted = frozenset(self.fields.union(fields))
+            cached = self._results.get(place_id)
+            if cached is not None and wanted <= cached.fields:
+                return cached
+            future = self._in_flight.get(place_id)
+            if future is not None and wanted <= future.fields:
+                owner = False
+            else:
+                future = Future()
+                future.fields = wanted
+                self._in_flight[place_id] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            cached_values = self.cache.get(place_id, wanted) if self.cache else None
+            if cached_values is not None:
+                details = parse_details(place_id, wanted, cached_values)
+            else:
+                details = self._fetch(place_id, wanted, budget if budget is not None else self.budget)
+        except Exception as e:
+            details = PlaceDetails(place_id, wanted, ok=False)
+            print(f"Details request failed for {place_id}: {e}")
+        with self._lock:
+            if details.ok:
+                self._results[place_id] = details
+            if self._in_flight.get(place_id) is future:
+                del self._in_flight[place_id]
+        future.set_result(details)
+        return details
+
+    def _fetch(self, place_id, fields, budget):
+        params = {"place_id": place_id, "fields": ",".join(sorted(fields)), "key": self.api_key}
+        delay = 0.25
+        for attempt in range(4):
+            # Every request sent is charged, OVER_QUERY_LIMIT retries included
+            if budget is not None and not budget.spend("details"):
+                return PlaceDetails(place_id, fields, ok=False)
+            self.limiter.acquire("details")
+            with self._lock:
+                self.api_calls += 1
+            with get_metrics().timer("places_details_api"):
+                response = self.session.get(DETAILS_URL, params=params, timeout=10)
+            get_metrics().add_bytes("places_details_api", len(response.content))
+            if response.status_code != 200:
+                return PlaceDetails(place_id, fields, ok=False)
+            data = response.json()
+            if data.get("status") not in RETRY_STATUSES:
+                break
+            time.sleep(delay)
+            delay *= 2
+        else:
+            return PlaceDetails(place_id, fields, ok=False)
+        status = data.get("status")
+        if status not in CACHED_STATUSES:
+            # REQUEST_DENIED, INVALID_REQUEST, UNKNOWN_ERROR...: say nothing about the place itself
+            print(f"Details request for {place_id} returned {status}: {data.get('error_message', '')}")
+            return PlaceDetails(place_id, fields, ok=False)
+        result = data.get("result", {})
+        if self.cache:
+            self.cache.put(place_id, {name: result.get(name) for name in fields})
+        return parse_details(place_id, fields, result)
+
+
+def parse_details(place_id, fields, result):
+    """Build a PlaceDetails from a Details "result" object (or its cached fields)"""
+    return PlaceDetails(
+        place_id,
+        fields,
+        website=result.get("website"),
+        weekday_text=(result.get("opening_hours") or {}).get("weekday_text", []),
+    )
+
+
+def fetch_text_search_page(params, session=None, limiter=None, max_wait=10.0, first_backoff=0.05, budget=None,
+                           token_issued_at=None):
+    """Request one Text Search page
+
+    A next_page_token is not usable until a moment after it is issued, so
+    instead of a fixed sleep the request is sent right away and retried with
+    short exponential backoff while Google answers INVALID_REQUEST (or
+    OVER_QUERY_LIMIT). The time a token took to become usable is recorded on
+    the limiter, counted from token_issued_at (the received_at of the page
+    that carried it, or the first attempt without it). Tokens that were
+    usable on the first attempt are not recorded, since that only bounds the
+    delay from above. Each request sent, retries included, is charged to
+    budget; None is returned once the budget is exhausted. Responses carry
+    received_at, a time.perf_counter() timestamp.
+    """
+    limiter = limiter or get_rate_limiter()
+    session = session or requests
+    has_token = "pagetoken" in params
+    started = time.perf_counter()
+    delay = first_backoff
+    retried = False
+    while True:
+        if budget is not None and not budget.spend("textsearch"):
+            return None
+        limiter.acquire("textsearch")
+        with get_metrics().timer("places_textsearch_api"):
+            response = session.get(TEXT_SEARCH_URL, params=params, timeout=10)
+        get_metrics().add_bytes("places_textsearch_api", len(response.content))
+        response.received_at = time.perf_counter()
+        if response.status_code != 200 or response.received_at - started >= max_wait:
+            return response
+        status = response.json().get("status")
+        if status in RETRY_STATUSES or (has_token and status == "INVALID_REQUEST"):
+            retried = True
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            continue
+        if has_token and retried:
+            limiter.record_page_token_delay(response.received_at - (token_issued_at or started))
+        return response
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_details_client(api_key, fields=("website",), cache_path=DEFAULT_CACHE_PATH):
+    """Return the process-wide client for api_key, widening its field mask if needed
+
+    The first call creates the client backed by the on-disk cache at cache_path
+    (pass cache_path=None to disable caching).
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            cache = PlaceCache(cache_path) if cache_path else None
+            client = _clients[api_key] = PlaceDetailsClient(api_key, fields, cache=cache)
+    client.require(*fields)
+    return client
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared API call budget and per-endpoint rate limiting for the Google Places scripts.
+"""
+
+import threading
+import time
+
+
+class QuotaBudget:
+    """Thread-safe count of API calls per endpoint with an optional overall cap"""
+
+    def __init__(self, max_calls=None):
+        self.max_calls = max_calls
+        self.calls = {}
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    def spend(self, endpoint, n=1):
+        """Record n calls to endpoint; returns False (and records nothing) once the cap is reached"""
+        with self._lock:
+            if self.max_calls is not None and self.total + n > self.max_calls:
+                self.denied += n
+                return False
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + n
+            return True
+
+    def exhausted(self):
+        return self.max_calls is not None and self.total >= self.max_calls
+
+
+DEFAULT_RATES = {
+    "textsearch": 10.0,
+    "details": 20.0,
+}
+
+
+class TokenBucket:
+    """Blocking token bucket refilled at rate tokens per second"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        """Take n tokens, sleeping until they are available; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                shortfall = (n - self.tokens) / self.rate
+            time.sleep(shortfall)
+            waited += shortfall
+
+
+class RateLimiter:
+    """One token bucket per endpoint, plus the observed page token warm-up delays"""
+
+    def __init__(self, rates=None):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.page_token_delays = []
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint):
+        with self._lock:
+            if endpoint not in self._buckets:
+                self._buckets[endpoint] = TokenBucket(self.rates.get(endpoint, 10.0))
+            return self._buckets[endpoint]
+
+    def acquire(self, endpoint, n=1):
+        return self.bucket(endpoint).acquire(n)
+
+    def set_rates(self, **rates):
+        """Change the rate of some endpoints; their buckets are rebuilt on next use"""
+        with self._lock:
+            self.rates.update(rates)
+            for endpoint in rates:
+                self._buckets.pop(endpoint, None)
+
+    def record_page_token_delay(self, seconds):
+        with self._lock:
+            self.page_token_delays.append(seconds)
+
+    def page_token_stats(self):
+        """Summary of how long next_page_tokens took to become usable"""
+        with self._lock:
+            delays = sorted(self.page_token_delays)
+        if not delays:
+            return {"count": 0}
+        return {
+            "count": len(delays),
+            "min": delays[0],
+            "median": delays[len(delays) // 2],
+            "p90": delays[min(len(delays) - 1, int(len(delays) * 0.9))],
+            "max": delays[-1],
+        }
+
+
+_default_limiter = RateLimiter()
+
+
+def get_rate_limiter():
+    """Process-wide limiter shared by every script and client"""
+    return _default_limiter
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Block heavy resources in Chrome sessions through the DevTools protocol.
+
+Network.setBlockedURLs makes Chrome drop matching requests before they are
+sent. Resource types (image, font, media, ...) are expressed as URL patterns
+on their file extensions, and analytics/ad hosts are blocked by host pattern.
+page_metrics() reads load time and bytes transferred from the Performance
+API so a flow can be compared with blocking on and off. Cross-origin
+responses without a Timing-Allow-Origin header report a transfer size of 0,
+so the byte counts are a lower bound.
+"""
+
+from dataclasses import dataclass
+
+
+RESOURCE_TYPE_PATTERNS = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ogg"],
+    "stylesheet": ["*.css"],
+}
+DEFAULT_BLOCKED_TYPES = ("image", "font", "media")
+DEFAULT_BLOCKED_PATTERNS = (
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*hotjar.com*", "*branch.io*", "*bat.bing.com*", "*clarity.ms*",
+)
+
+PAGE_METRICS_JS = """
+const nav = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+let bytes = nav ? nav.transferSize : 0;
+for (const entry of resources) bytes += entry.transferSize;
+return {
+    load_ms: nav ? (nav.loadEventEnd || performance.now()) - nav.startTime : performance.now(),
+    dom_ready_ms: nav ? nav.domContentLoadedEventEnd - nav.startTime : null,
+    bytes: bytes,
+    requests: resources.length + 1,
+};
+"""
+
+
+def blocked_patterns(types=DEFAULT_BLOCKED_TYPES, patterns=DEFAULT_BLOCKED_PATTERNS):
+    urls = [pattern for resource_type in types for pattern in RESOURCE_TYPE_PATTERNS[resource_type]]
+    return urls + list(patterns)
+
+
+def set_blocked_urls(driver, urls):
+    # setBlockedURLs only takes effect once the Network domain is enabled
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(urls)})
+
+
+def enable_blocking(driver, types=DEFAULT_BLOCKED_TYPES, patterns=DEFAULT_BLOCKED_PATTERNS):
+    """Block the given resource types and URL patterns for the driver's current tab"""
+    set_blocked_urls(driver, blocked_patterns(types, patterns))
+
+
+def disable_blocking(driver):
+    set_blocked_urls(driver, [])
+
+
+def page_metrics(driver):
+    """Load time, DOM-ready time, bytes transferred and request count of the current page"""
+    return driver.execute_script(PAGE_METRICS_JS)
+
+
+@dataclass
+class BlockingComparison:
+    url: str
+    unblocked: dict
+    blocked: dict
+
+    def __str__(self):
+        before, after = self.unblocked, self.blocked
+        saved = 1 - after["bytes"] / before["bytes"] if before["bytes"] else 0.0
+        return (f"{self.url}: load {before['load_ms']:.0f}ms -> {after['load_ms']:.0f}ms, "
+                f"{before['bytes'] / 1024:.0f}KiB -> {after['bytes'] / 1024:.0f}KiB ({saved:.0%} fewer bytes), "
+                f"{before['requests']} -> {after['requests']} requests")
+
+
+def load_and_measure(driver, url, ready=None):
+    """Load url with an empty cache and return its page_metrics; ready(driver) waits for the flow's element"""
+    driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    driver.get(url)
+    if ready:
+        ready(driver)
+    return page_metrics(driver)
+
+
+def compare_blocking(driver, url, ready=None, types=DEFAULT_BLOCKED_TYPES, patterns=DEFAULT_BLOCKED_PATTERNS):
+    """Load url with blocking off, then on, and return both measurements; blocking is left off afterwards"""
+    disable_blocking(driver)
+    unblocked = load_and_measure(driver, url, ready)
+    enable_blocking(driver, types, patterns)
+    try:
+        blocked = load_and_measure(driver, url, ready)
+    finally:
+        disable_blocking(driver)
+    return BlockingComparison(url, unblocked, blocked)
+
+
+if __name__ == "__main__":
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
+    from driver_pool import new_chrome
+    from indeed_harvester import search_url
+    from waits import wait_for
+
+    # 各フローのページで、ブロックなし・ありの読み込み時間と転送量を比較
+    flows = [
+        (search_url("Software Engineer", "Remote"),
+         lambda d: wait_for(d, "search_results", EC.presence_of_element_located((By.CLASS_NAME, "job_seen_beacon")))),
+    ]
+    driver = new_chrome()
+    try:
+        for url, ready in flows:
+            print(compare_blocking(driver, url, ready))
+    finally:
+        driver.quit()
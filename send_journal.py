@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only, fsync'd journal of successful sends.
+
+Every send is written as one JSON line and fsync'd before the next one
+starts, so a run that dies halfway leaves a record of exactly what went out.
+Opening the journal replays it; rows already in it are skipped on the next
+run and merged into the execution_flag column in bulk. A torn last line
+from a crash is ignored and cut off, so the next record starts on a line
+of its own.
+"""
+
+import json
+import os
+import threading
+import time
+
+from dedup_index import normalize_address, normalize_name
+
+
+def journal_path_for(filename):
+    """Journal kept next to the workbook it belongs to"""
+    return filename + ".sendlog"
+
+
+def send_key(name, address):
+    return normalize_name(name), normalize_address(address)
+
+
+def truncate_torn_line(path):
+    """Cut a partly written last line off the journal"""
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if not size:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline in blocks; the torn line is at most one record long
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                break
+            end = start
+        else:
+            f.truncate(0)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class SendJournal:
+    """Set of (name, address) keys already sent, backed by an append-only file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.sent = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.sent[send_key(record["name"], record["address"])] = record["email"]
+            truncate_torn_line(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __len__(self):
+        return len(self.sent)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_sent(self, name, address):
+        return send_key(name, address) in self.sent
+
+    def record(self, name, address, email):
+        """Durably record one successful send; safe to call from several threads"""
+        line = json.dumps({"time": time.time(), "name": name, "address": address, "email": email}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.sent[send_key(name, address)] = email
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch SMTP sender that keeps one logged-in connection for a whole send run.
+
+The connection is opened lazily, reused for every message, reset after
+max_per_connection messages and re-established transparently when the server
+drops it. With use_ssl=False it speaks plain SMTP, e.g. to a local test
+sink. Time spent connecting (TLS handshake + login) and time spent
+sending are tracked separately so a run can report its throughput.
+"""
+
+import smtplib
+import ssl
+import time
+from dataclasses import dataclass
+
+
+GMAIL_SMTP_HOST = "smtp.gmail.com"
+GMAIL_SMTP_PORT = 465
+
+# Replies that mean "this connection is done, try again on a new one"
+RECONNECT_CODES = (421, 451, 454)
+
+
+@dataclass
+class BatchStats:
+    sent: int = 0
+    failed: int = 0
+    connects: int = 0
+    reconnects: int = 0
+    connect_seconds: float = 0.0
+    send_seconds: float = 0.0
+
+    @property
+    def seconds(self):
+        return self.connect_seconds + self.send_seconds
+
+    @property
+    def messages_per_second(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.sent} sent, {self.failed} failed in {self.seconds:.1f}s "
+                f"({self.messages_per_second:.2f} msg/s); {self.connects} connections "
+                f"({self.reconnects} reconnects) took {self.connect_seconds:.1f}s, sending took {self.send_seconds:.1f}s")
+
+
+class SMTPBatchSender:
+    """Reusable authenticated SMTP connection; use as a context manager around a send loop
+
+    Without an account the login step is skipped.
+    """
+
+    def __init__(self, account, password, host=GMAIL_SMTP_HOST, port=GMAIL_SMTP_PORT,
+                 max_per_connection=100, retries=2, timeout=30, use_ssl=True):
+        self.account = account
+        self.password = password
+        self.host = host
+        self.port = port
+        self.max_per_connection = max_per_connection
+        self.retries = retries
+        self.timeout = timeout
+        self.use_ssl = use_ssl
+        self.stats = BatchStats()
+        self._context = ssl.create_default_context()
+        self._server = None
+        self._sent_on_connection = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            if self.use_ssl:
+                server = smtplib.SMTP_SSL(self.host, self.port, context=self._context, timeout=self.timeout)
+            else:
+                server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.account:
+                    server.login(self.account, self.password)
+            except Exception:
+                server.close()
+                raise
+        finally:
+            self.stats.connect_seconds += time.perf_counter() - started
+        self.stats.connects += 1
+        self._server = server
+        self._sent_on_connection = 0
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except smtplib.SMTPException:
+            self._server.close()
+        except OSError:
+            pass
+        self._server = None
+
+    def send(self, msg):
+        """Send one message, reconnecting if the connection was dropped; raises once retries are used up"""
+        for attempt in range(self.retries + 1):
+            if self._server is not None and self.max_per_connection and self._sent_on_connection >= self.max_per_connection:
+                self.close()
+            if self._server is None:
+                if attempt or self.stats.connects:
+                    self.stats.reconnects += 1
+                try:
+                    self.connect()
+                except (smtplib.SMTPException, OSError):
+                    self.stats.failed += 1
+                    raise
+            started = time.perf_counter()
+            try:
+                self._server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                error = e
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code not in RECONNECT_CODES:
+                    self.stats.failed += 1
+                    raise
+                error = e
+            except smtplib.SMTPException:
+                # e.g. every recipient refused; retrying would not help
+                self.stats.failed += 1
+                raise
+            else:
+                self._sent_on_connection += 1
+                self.stats.sent += 1
+                return
+            finally:
+                self.stats.send_seconds += time.perf_counter() - started
+            # The connection is unusable; drop it and retry on a fresh one
+            self.close()
+        self.stats.failed += 1
+        raise error
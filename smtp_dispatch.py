@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel, rate-limited SMTP dispatcher for the application senders.
+
+Send jobs are drained from a queue by a few worker threads, each of which
+owns one SMTPBatchSender connection. A token bucket caps messages per minute
+and a QuotaBudget caps messages per rolling day (Gmail allows about 500 a day
+from a personal account): the caller passes how many were already sent in
+the last 24 hours and the run may only send the rest. Transient failures
+(4xx replies, dropped connections) are retried with exponential backoff;
+permanent 5xx failures are reported separately and never retried.
+"""
+
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
+
+from perf_metrics import instrument
+from rate_limit import QuotaBudget, TokenBucket
+from smtp_batch import GMAIL_SMTP_HOST, GMAIL_SMTP_PORT, BatchStats, SMTPBatchSender
+
+
+GMAIL_PER_MINUTE = 20
+GMAIL_PER_DAY = 500
+
+
+@dataclass
+class SendJob:
+    key: object
+    to_email: str
+    name: str
+
+
+@dataclass
+class DispatchResult:
+    sent: list = field(default_factory=list)
+    transient: dict = field(default_factory=dict)
+    permanent: dict = field(default_factory=dict)
+    deferred: list = field(default_factory=list)
+    stats: BatchStats = field(default_factory=BatchStats)
+    wall_time: float = 0.0
+
+    def __str__(self):
+        rate = len(self.sent) / self.wall_time if self.wall_time else 0.0
+        return (f"{len(self.sent)} sent, {len(self.transient)} transient failures, "
+                f"{len(self.permanent)} permanent failures, {len(self.deferred)} deferred (daily cap) "
+                f"in {self.wall_time:.1f}s ({rate:.2f} msg/s); {self.stats.connects} connections "
+                f"took {self.stats.connect_seconds:.1f}s")
+
+
+def is_permanent(error):
+    """True for 5xx replies; everything else (4xx, dropped connections, timeouts) is worth retrying"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(code >= 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class SMTPDispatcher:
+    """Send a queue of jobs over several connections within the per-minute and rolling per-day caps"""
+
+    def __init__(self, account, password, host=GMAIL_SMTP_HOST, port=GMAIL_SMTP_PORT, use_ssl=True,
+                 connections=3, per_minute=GMAIL_PER_MINUTE, per_day=GMAIL_PER_DAY, sent_last_day=0,
+                 retries=3, backoff=2.0, max_backoff=60.0):
+        self.account = account
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.connections = connections
+        self.bucket = TokenBucket(per_minute / 60.0, capacity=min(per_minute, connections)) if per_minute else None
+        self.budget = QuotaBudget(max_calls=max(0, per_day - sent_last_day) if per_day else None)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def new_sender(self):
+        return SMTPBatchSender(self.account, self.password, self.host, self.port, use_ssl=self.use_ssl)
+
+    def dispatch(self, jobs, build_message, on_sent=None):
+        """Send every job with build_message(job) and return a DispatchResult
+
+        on_sent(job) is called from the worker thread right after each
+        successful send, so callers can record progress as it happens.
+        """
+        started = time.perf_counter()
+        result = DispatchResult()
+        pending = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+        lock = threading.Lock()
+
+        def worker():
+            sender = self.new_sender()
+            with sender:
+                while True:
+                    try:
+                        job = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if not self.budget.spend("smtp"):
+                        with lock:
+                            result.deferred.append(job.key)
+                        continue
+                    error = self._send(sender, job, build_message)
+                    with lock:
+                        if error is None:
+                            result.sent.append(job.key)
+                        elif is_permanent(error):
+                            result.permanent[job.key] = error
+                        else:
+                            result.transient[job.key] = error
+                    if error is None and on_sent:
+                        on_sent(job)
+            with lock:
+                for name in ("connects", "reconnects", "connect_seconds", "send_seconds"):
+                    setattr(result.stats, name, getattr(result.stats, name) + getattr(sender.stats, name))
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, self.connections))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result.stats.sent = len(result.sent)
+        result.stats.failed = len(result.transient) + len(result.permanent)
+        result.wall_time = time.perf_counter() - started
+        return result
+
+    @instrument("send_email", is_error=lambda error: error is not None)
+    def _send(self, sender, job, build_message):
+        """Send one job, retrying transient failures; returns None on success or the last error"""
+        msg = build_message(job)
+        for attempt in range(self.retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                sender.send(msg)
+                return None
+            except (smtplib.SMTPException, OSError) as e:
+                if is_permanent(e) or attempt == self.retries:
+                    return e
+                time.sleep(min(self.max_backoff, self.backoff * 2 ** attempt))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Global recipient suppression list shared by every workbook and profile.
+
+Every address we have applied to is stored in SQLite together with its
+domain. The whole list is loaded into two sets when it is opened, so the
+check before each send is a pair of set lookups, and a business is only
+contacted once even if it appears in several workbooks or sweeps. Free-mail
+domains (gmail.com, ...) are never suppressed as a whole. The time of each
+send is kept too, so sent_since() gives the rolling count of sends that the
+Gmail daily limit is checked against.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from email_extract import FREE_MAIL_DOMAINS
+
+
+DEFAULT_SUPPRESSION_PATH = "resume/suppression.sqlite"
+
+DAY = 24 * 60 * 60
+
+
+def normalize_email(address):
+    """Lowercase, trimmed, without a +tag in the local part"""
+    if not isinstance(address, str) or "@" not in address:
+        return ""
+    local, _, domain = address.strip().lower().rpartition("@")
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def email_domain(address):
+    """Domain an address blocks, or "" for free-mail providers shared by unrelated businesses"""
+    domain = normalize_email(address).rpartition("@")[2]
+    return "" if domain in FREE_MAIL_DOMAINS else domain
+
+
+class SuppressionList:
+    """Addresses and domains that must not be sent to again"""
+
+    def __init__(self, path=DEFAULT_SUPPRESSION_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.exists = os.path.exists(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS suppressed (
+                email TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                reason TEXT,
+                source TEXT,
+                added_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_suppressed_domain ON suppressed (domain);
+        """)
+        self.emails = set()
+        self.domains = set()
+        for email, domain in self._conn.execute("SELECT email, domain FROM suppressed"):
+            self.emails.add(email)
+            if domain:
+                self.domains.add(domain)
+        # Addresses and domains queued in this run, so one batch never sends twice either
+        self._claimed_emails = set()
+        self._claimed_domains = set()
+        self.avoided = {}
+
+    def __len__(self):
+        return len(self.emails)
+
+    def reason(self, address):
+        """Why address must be skipped, or None"""
+        email = normalize_email(address)
+        domain = email_domain(email)
+        if email in self.emails:
+            return "already sent"
+        if domain and domain in self.domains:
+            return "domain already contacted"
+        if email in self._claimed_emails or (domain and domain in self._claimed_domains):
+            return "duplicate in this run"
+        return None
+
+    def claim(self, address):
+        """Reserve address for this run; returns the reason to skip it instead if it is suppressed"""
+        with self._lock:
+            reason = self.reason(address)
+            if reason:
+                self.avoided[reason] = self.avoided.get(reason, 0) + 1
+                return reason
+            email = normalize_email(address)
+            self._claimed_emails.add(email)
+            if email_domain(email):
+                self._claimed_domains.add(email_domain(email))
+            return None
+
+    def add_many(self, addresses, reason="sent", source=None, added_at=None):
+        """Suppress addresses from now on; returns how many were new
+
+        added_at defaults to now; pass 0 when the time of the send is unknown.
+        """
+        now = time.time() if added_at is None else added_at
+        rows = {}
+        for address in addresses:
+            email = normalize_email(address)
+            if email and email not in self.emails:
+                rows[email] = (email, email_domain(email), reason, source, now)
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO suppressed VALUES (?, ?, ?, ?, ?)", rows.values())
+            for email, domain, *_ in rows.values():
+                self.emails.add(email)
+                if domain:
+                    self.domains.add(domain)
+        self.exists = True
+        return len(rows)
+
+    def add(self, address, reason="sent", source=None):
+        return self.add_many([address], reason, source)
+
+    def sent_since(self, timestamp):
+        """Number of addresses sent to at or after timestamp"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM suppressed WHERE reason = 'sent' AND added_at >= ?", (timestamp,)
+            ).fetchone()[0]
+
+    def sent_last_day(self):
+        return self.sent_since(time.time() - DAY)
+
+    def import_workbooks(self, filenames):
+        """Suppress every address already marked as sent (execution_flag) in the given workbooks"""
+        import pandas as pd
+
+        added = 0
+        for filename in filenames:
+            if not os.path.exists(filename):
+                continue
+            try:
+                for df in pd.read_excel(filename, sheet_name=None).values():
+                    if "execution_flag" not in df.columns or "email" not in df.columns:
+                        continue
+                    sent = df[df["execution_flag"] == True]
+                    # When these were sent is unknown, so they never count towards today's limit
+                    added += self.add_many(sent["email"].dropna(), "sent", filename, added_at=0)
+            except Exception as e:
+                print(f"Error reading Excel: {e}")
+        return added
+
+    def report(self):
+        total = sum(self.avoided.values())
+        details = ", ".join(f"{count} {reason}" for reason, count in sorted(self.avoided.items()))
+        return f"Suppression avoided {total} sends" + (f" ({details})" if details else "")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-query sweep over categories x locations.
+
+Runs the ExcelAutomation_v5 paging loops for every "<category> near <location>"
+query concurrently. All queries share one dedup set, the shared Place Details
+client and one API call budget, and every collected place is upserted into
+the lead store as soon as it is resolved. The budget is passed with each
+call rather than set on the client, so sweeps running side by side in one
+process keep their own.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from ExcelAutomation_v5 import load_dedup_index, search_places_with_text
+from lead_store import DEFAULT_DB_PATH, LeadStore
+from rate_limit import QuotaBudget
+
+
+@dataclass
+class QueryReport:
+    query: str
+    collected: int = 0
+    new_leads: int = 0
+    with_email: int = 0
+    seconds: float = 0.0
+    error: str = None
+
+
+@dataclass
+class SweepReport:
+    queries: list = field(default_factory=list)
+    api_calls: dict = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    @property
+    def new_leads(self):
+        return sum(report.new_leads for report in self.queries)
+
+    @property
+    def total_api_calls(self):
+        return sum(self.api_calls.values())
+
+    @property
+    def new_leads_per_call(self):
+        return self.new_leads / self.total_api_calls if self.total_api_calls else 0.0
+
+    def print_summary(self):
+        for report in self.queries:
+            status = f" ERROR: {report.error}" if report.error else ""
+            print(f"{report.query}: {report.collected} collected, {report.new_leads} new, "
+                  f"{report.with_email} with email in {report.seconds:.1f}s{status}")
+        print(f"API calls: {self.api_calls} -> {self.new_leads_per_call:.2f} new leads per call")
+        print(f"Total: {self.new_leads} new leads in {self.wall_time:.1f}s")
+
+
+def build_queries(categories, locations):
+    return [f"{category} near {location}" for category in categories for location in locations]
+
+
+def run_sweep(categories, locations, api_key, store=None, dedup_index=None, budget=None,
+              query_workers=4, max_results=60, details_limit=8, scrape_limit=8):
+    """Run every category x location query concurrently and stream results into the lead store"""
+    started = time.perf_counter()
+    store = store or LeadStore(DEFAULT_DB_PATH)
+    dedup_index = dedup_index if dedup_index is not None else load_dedup_index()
+    budget = budget or QuotaBudget()
+    existing_names = set(dedup_index.names)
+    names_lock = threading.Lock()  # overlapping queries (e.g. "Cafe near X", "Restaurant near X") share places
+    report = SweepReport()
+    report_lock = threading.Lock()
+
+    def run_query(query):
+        query_report = QueryReport(query)
+
+        def on_result(entry):
+            inserted = store.upsert_many([entry])
+            dedup_index.add_many([entry])
+            with report_lock:
+                query_report.collected += 1
+                query_report.new_leads += inserted
+                query_report.with_email += "@" in entry["email"]
+
+        query_started = time.perf_counter()
+        try:
+            search_places_with_text(query, api_key, max_results=max_results, existing_names=existing_names,
+                                    parallel=True, details_limit=details_limit, scrape_limit=scrape_limit,
+                                    dedup_index=dedup_index, budget=budget, on_result=on_result,
+                                    names_lock=names_lock)
+        except Exception as e:
+            query_report.error = str(e)
+        query_report.seconds = time.perf_counter() - query_started
+        return query_report
+
+    with ThreadPoolExecutor(max_workers=query_workers) as executor:
+        report.queries = list(executor.map(run_query, build_queries(categories, locations)))
+
+    report.api_calls = dict(budget.calls)
+    report.wall_time = time.perf_counter() - started
+    return report
+
+
+if __name__ == "__main__":
+    import my_gmail_account as gmail
+
+    categories = ["Cafe", "Restaurant"]
+    locations = ["Dandenong", "Murrumbeena", "CBD"]
+
+    report = run_sweep(categories, locations, gmail.api_key, budget=QuotaBudget(max_calls=1000))
+    report.print_summary()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumented explicit waits for the Selenium scripts.
+
+Each step of a browser flow waits on its own condition (an element present,
+a button clickable, a new window) instead of a fixed time.sleep, and the time
+the condition actually took is recorded under the step's name. The recorder
+summarises every step as a distribution so slow steps stand out.
+"""
+
+import json
+import os
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from perf_metrics import get_metrics
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class WaitRecorder:
+    """Thread-safe durations of every waited-for step, by step name"""
+
+    def __init__(self):
+        self.durations = {}
+        self.timeouts = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds, timed_out=False):
+        with self._lock:
+            self.durations.setdefault(step, []).append(seconds)
+            if timed_out:
+                self.timeouts[step] = self.timeouts.get(step, 0) + 1
+
+    def stats(self):
+        """Per step: count, timeouts, min, median, p90, max and total seconds"""
+        with self._lock:
+            steps = {step: sorted(values) for step, values in self.durations.items()}
+            timeouts = dict(self.timeouts)
+        return {
+            step: {
+                "count": len(values),
+                "timeouts": timeouts.get(step, 0),
+                "min": values[0],
+                "median": percentile(values, 0.5),
+                "p90": percentile(values, 0.9),
+                "max": values[-1],
+                "total": sum(values),
+            }
+            for step, values in steps.items()
+        }
+
+    def print_summary(self):
+        for step, s in sorted(self.stats().items(), key=lambda item: -item[1]["total"]):
+            print(f"{step}: {s['count']} waits ({s['timeouts']} timeouts), median {s['median']:.2f}s, "
+                  f"p90 {s['p90']:.2f}s, max {s['max']:.2f}s, total {s['total']:.1f}s")
+
+    def write_json(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+_default_recorder = WaitRecorder()
+
+
+def get_wait_recorder():
+    """Process-wide recorder shared by every driver"""
+    return _default_recorder
+
+
+def wait_for(driver, step, condition, timeout=10, poll=0.1, recorder=None):
+    """WebDriverWait(...).until(condition), timed and recorded under step
+
+    Raises selenium's TimeoutException like until() does; the timeout is
+    recorded too.
+    """
+    recorder = recorder or _default_recorder
+    started = time.perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=poll).until(condition)
+    except TimeoutException:
+        recorder.record(step, time.perf_counter() - started, timed_out=True)
+        get_metrics().observe(f"selenium.{step}", time.perf_counter() - started, error=True)
+        raise
+    recorder.record(step, time.perf_counter() - started)
+    get_metrics().observe(f"selenium.{step}", time.perf_counter() - started)
+    return result
+
+
+def new_window_opened(known_handles):
+    """Condition: a window handle that was not in known_handles exists; returns it"""
+    known = set(known_handles)
+
+    def condition(driver):
+        fresh = [handle for handle in driver.window_handles if handle not in known]
+        return fresh[-1] if fresh else False
+
+    return condition
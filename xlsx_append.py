@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only xlsx writer for the save_to_excel functions.
+
+An xlsx file is a zip archive and cannot be extended in place, so existing
+rows are streamed from a read-only workbook into a write-only one, followed by
+the new rows that are not already present. Rows are streamed and only their
+dedup keys are kept in memory, so memory grows with the number of rows but
+not with their size. The result replaces the original only after it has been
+written completely (temp file + os.replace), so a crash never leaves a
+half-written workbook behind.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+from openpyxl import Workbook, load_workbook
+
+
+DEFAULT_SHEET = "Sheet1"
+
+
+@dataclass
+class AppendResult:
+    rows_written: int = 0
+    elapsed: float = 0.0
+    per_sheet: dict = field(default_factory=dict)
+
+    def __str__(self):
+        return f"Appended {self.rows_written} rows in {self.elapsed:.2f}s {self.per_sheet}"
+
+
+def _row_key(values, key_indexes):
+    return tuple("" if values[i] is None else str(values[i]) for i in key_indexes)
+
+
+def _copy_mode(filename, temp_path):
+    if os.path.exists(filename):
+        shutil.copymode(filename, temp_path)
+    else:
+        # A new workbook gets the usual mode for new files under the current umask
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+
+
+def append_rows(filename, sheets, key=("name", "address")):
+    """Append new rows to the named sheets, skipping rows whose key columns already exist
+
+    sheets maps a sheet name (None for the first sheet of the workbook) to a
+    list of row dicts. Columns missing from an existing header are added at the
+    end of it.
+    """
+    started = time.perf_counter()
+    result = AppendResult()
+    source = load_workbook(filename, read_only=True) if os.path.exists(filename) else None
+    existing_titles = source.sheetnames if source else []
+    sheets = {(name or (existing_titles[0] if existing_titles else DEFAULT_SHEET)): rows
+              for name, rows in sheets.items()}
+
+    target = Workbook(write_only=True)
+    directory = os.path.dirname(os.path.abspath(filename))
+    handle, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=directory)
+    os.close(handle)
+    try:
+        for title in existing_titles + [name for name in sheets if name not in existing_titles]:
+            rows_in = source[title].iter_rows(values_only=True) if title in existing_titles else iter(())
+            new_rows = sheets.get(title, [])
+            header = list(next(rows_in, None) or [])
+            header += [column for row in new_rows for column in row if column not in header]
+            header = list(dict.fromkeys(header))
+            key_indexes = [header.index(column) for column in key if column in header]
+
+            out = target.create_sheet(title)
+            if header:
+                out.append(header)
+            seen = set()
+            for values in rows_in:
+                values = list(values) + [None] * (len(header) - len(values))
+                seen.add(_row_key(values, key_indexes))
+                out.append(values)
+
+            written = 0
+            for row in new_rows:
+                values = [row.get(column) for column in header]
+                row_key = _row_key(values, key_indexes)
+                if row_key in seen:
+                    continue
+                seen.add(row_key)
+                out.append(values)
+                written += 1
+            if title in sheets:
+                result.per_sheet[title] = written
+            result.rows_written += written
+
+        target.save(temp_path)
+        if source:
+            source.close()
+        # mkstemp creates the file 0600; keep the workbook's own permissions
+        _copy_mode(filename, temp_path)
+        os.replace(temp_path, filename)
+    except BaseException:
+        if source:
+            source.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    result.elapsed = time.perf_counter() - started
+    return result